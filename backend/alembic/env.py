@@ -16,14 +16,15 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-fileConfig(config.config_file_name)
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from app.db import Base
-from app.models import User, Product
+from app.models import User, Product, RevokedToken, ChangeSequence, RelatedProduct, AuditEvent
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -35,7 +36,7 @@ target_metadata = Base.metadata
 DB_TYPE = os.getenv("DB_TYPE", "sqlite")
 
 if DB_TYPE == "sqlite":
-    config.set_main_option("sqlalchemy.url", "sqlite:///./test.db")
+    config.set_main_option("sqlalchemy.url", os.getenv("SQLITE_DATABASE_URL", "sqlite:///./test.db"))
 else:
     config.set_main_option("sqlalchemy.url", 
         f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@"
@@ -73,6 +74,13 @@ def run_migrations_online():
     and associate a connection with the context.
 
     """
+    # Scripts (e.g. benchmarks/bench_migrations.py) may pass their own
+    # connection in config.attributes
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
         prefix="sqlalchemy.",
@@ -80,12 +88,20 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+        do_run_migrations(connection)
+
+
+def do_run_migrations(connection):
+    # Commit after each revision, so a long migration that fails part way
+    # keeps the revisions before it (see app/migrations.py)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        transaction_per_migration=True,
+    )
 
-        with context.begin_transaction():
-            context.run_migrations()
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,39 @@
+"""revoked_tokens
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('token_type', sa.String(length=10), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_revoked_tokens_id', 'revoked_tokens', ['id'])
+    op.create_index('ix_revoked_tokens_jti', 'revoked_tokens', ['jti'], unique=True)
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_jti', table_name='revoked_tokens')
+    op.drop_index('ix_revoked_tokens_id', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
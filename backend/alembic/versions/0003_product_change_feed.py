@@ -0,0 +1,61 @@
+"""product soft deletes and change feed
+
+Adds products.deleted_at and products.change_seq, numbers existing rows
+with a batched backfill and builds the unique change_seq index without
+blocking writes. Safe to re-run after an interruption.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import add_column_if_missing, backfill, create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+products = sa.table('products', sa.column('id', sa.Integer), sa.column('change_seq', sa.BigInteger))
+change_sequences = sa.table('change_sequences', sa.column('name', sa.String), sa.column('value', sa.BigInteger))
+
+
+def upgrade():
+    add_column_if_missing('products', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    add_column_if_missing('products', sa.Column('change_seq', sa.BigInteger(), nullable=True))
+    if not sa.inspect(op.get_bind()).has_table('change_sequences'):
+        op.create_table(
+            'change_sequences',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('value', sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint('name'),
+        )
+
+    # Start the counter above every existing id before backfilling, so rows
+    # written by the new code while the backfill runs never collide with it
+    bind = op.get_bind()
+    last = bind.execute(sa.select(sa.func.coalesce(sa.func.max(products.c.id), 0))).scalar()
+    counter = change_sequences.c.name == 'products'
+    current = bind.execute(sa.select(change_sequences.c.value).where(counter)).scalar()
+    if current is None:
+        op.execute(change_sequences.insert().values(name='products', value=last))
+    elif current < last:
+        op.execute(change_sequences.update().where(counter).values(value=last))
+
+    # Existing products enter the feed in id order
+    backfill(products, {'change_seq': products.c.id}, products.c.change_seq.is_(None))
+
+    create_index_concurrently('ix_products_change_seq', 'products', ['change_seq'], unique=True)
+
+
+def downgrade():
+    drop_index_concurrently('ix_products_change_seq', 'products')
+    op.drop_table('change_sequences')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('change_seq')
+        batch_op.drop_column('deleted_at')
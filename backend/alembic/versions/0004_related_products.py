@@ -0,0 +1,40 @@
+"""related products
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'related_products',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.SmallInteger(), nullable=False),
+        sa.Column('related_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.ForeignKeyConstraint(['related_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('product_id', 'rank'),
+    )
+    op.create_index('ix_related_products_related_id', 'related_products', ['related_id'])
+    create_index_concurrently('ix_products_category_price', 'products', ['category', 'price'])
+    # Fill the table afterwards with build_related.py
+
+
+def downgrade():
+    drop_index_concurrently('ix_products_category_price', 'products')
+    op.drop_index('ix_related_products_related_id', table_name='related_products')
+    op.drop_table('related_products')
@@ -0,0 +1,39 @@
+"""audit events
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'audit_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('action', sa.String(length=50), nullable=False),
+        sa.Column('actor', sa.String(length=100), nullable=True),
+        sa.Column('target', sa.String(length=100), nullable=True),
+        sa.Column('success', sa.Boolean(), nullable=False),
+        sa.Column('ip', sa.String(length=45), nullable=True),
+        sa.Column('details', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_audit_events_action_id', 'audit_events', ['action', 'id'])
+    op.create_index('ix_audit_events_actor_id', 'audit_events', ['actor', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_audit_events_actor_id', table_name='audit_events')
+    op.drop_index('ix_audit_events_action_id', table_name='audit_events')
+    op.drop_table('audit_events')
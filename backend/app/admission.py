@@ -0,0 +1,241 @@
+"""
+Admission control.
+
+Every request is sorted into a route class (browse, auth, admin_write)
+before it reaches the app. Each class may run at most `limit` requests at
+once and is guaranteed a `reserved` share of the total capacity; the rest
+of the capacity is shared, handed out to waiting classes in `priority`
+order (lower first). Requests that can't start wait in a bounded per-class
+queue.
+
+Queues are watched CoDel-style: when the time requests spend queued stays
+above `target_ms` for a whole `interval_ms`, the class is overloaded, and
+requests that have to wait get only `target_ms` to be admitted before
+they are turned away with 503 and Retry-After. Otherwise the wait is
+bounded by `max_wait_ms`. The overload ends as soon as a request is
+admitted within the target or the queue drains.
+
+Settings come from the ADMISSION_CONTROL environment variable, a JSON
+object merged over DEFAULT_CONFIG, e.g.
+{"classes": {"browse": {"reserved": 0.6}}}.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "")
+
+DEFAULT_CONFIG = {
+    "enabled": True,
+    # Requests running at once; None means the capacity the app passes in
+    "capacity": None,
+    "target_ms": 50,
+    "interval_ms": 500,
+    "retry_after": 1,
+    "classes": {
+        # Catalog reads: cheap, and should stay fast under load
+        "browse": {"priority": 0, "reserved": 0.5, "limit": 1.0, "queue": 200, "max_wait_ms": 1000},
+        # Login and registration: bcrypt makes these slow
+        "auth": {"priority": 1, "reserved": 0.1, "limit": 0.25, "queue": 50, "max_wait_ms": 2000},
+        # Product writes by admins
+        "admin_write": {"priority": 2, "reserved": 0.1, "limit": 0.25, "queue": 50, "max_wait_ms": 2000},
+    },
+}
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Auth routes that hash a password. The others (refresh, me, logout) only
+# check a JWT, so they are as cheap as a catalog read and stay in browse
+PASSWORD_PATHS = {"/api/auth/token", "/api/auth/register"}
+
+def classify(method: str, path: str) -> str:
+    """Route class of a request."""
+    if path in PASSWORD_PATHS:
+        return "auth"
+    if method not in SAFE_METHODS and path.startswith("/api/products"):
+        return "admin_write"
+    return "browse"
+
+def load_config(raw: str = "") -> dict:
+    """DEFAULT_CONFIG with the JSON settings in `raw` merged over it."""
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    overrides = json.loads(raw) if raw.strip() else {}
+    classes = overrides.pop("classes", {})
+    config.update(overrides)
+    for name, settings in classes.items():
+        if name not in config["classes"]:
+            raise ValueError(f"Unknown admission class: {name}")
+        config["classes"][name].update(settings)
+    return config
+
+class Shed(Exception):
+    """The request was turned away."""
+
+class _Class:
+    """Limits and state of one route class."""
+
+    def __init__(self, name: str, settings: dict, capacity: int, target: float, interval: float):
+        self.name = name
+        self.priority = settings["priority"]
+        self.reserved = int(capacity * settings["reserved"])
+        # Fractions are shares of the capacity, integers are request counts
+        limit = settings["limit"]
+        self.limit = max(1, int(capacity * limit) if isinstance(limit, float) else limit)
+        self.max_queue = settings["queue"]
+        self.max_wait = settings["max_wait_ms"] / 1000
+        self.target = target
+        self.interval = interval
+        self.active = 0
+        self.queue = deque()
+        # CoDel state: when queueing delay first went above target
+        self.first_above = None
+        self.shed = {"queue_full": 0, "overloaded": 0, "timeout": 0}
+
+    def record_sojourn(self, sojourn: float, now: float):
+        if sojourn < self.target:
+            self.first_above = None
+        elif self.first_above is None:
+            self.first_above = now
+
+    def overloaded(self, now: float) -> bool:
+        return self.first_above is not None and now - self.first_above >= self.interval
+
+class AdmissionController:
+    """
+    Decides which requests run, wait or are shed. All state lives on the
+    event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, config: dict, capacity: int):
+        self.capacity = capacity
+        self.retry_after = config["retry_after"]
+        target = config["target_ms"] / 1000
+        interval = config["interval_ms"] / 1000
+        self.classes = {
+            name: _Class(name, settings, capacity, target, interval)
+            for name, settings in config["classes"].items()
+        }
+        if sum(cls.reserved for cls in self.classes.values()) > capacity:
+            raise ValueError("Reserved admission shares add up to more than the capacity")
+        self.by_priority = sorted(self.classes.values(), key=lambda cls: cls.priority)
+
+    def _borrowed(self) -> int:
+        return sum(max(0, cls.active - cls.reserved) for cls in self.classes.values())
+
+    def _can_start(self, cls: _Class) -> bool:
+        if cls.active >= cls.limit:
+            return False
+        if cls.active < cls.reserved:
+            return True
+        shared = self.capacity - sum(other.reserved for other in self.classes.values())
+        return self._borrowed() < shared
+
+    async def acquire(self, name: str):
+        """Wait for a slot in class `name`, or raise Shed."""
+        cls = self.classes[name]
+        now = time.monotonic()
+        if not cls.queue:
+            # Nothing is waiting, so there is no standing delay: any overload is over
+            cls.record_sojourn(0, now)
+            if self._can_start(cls):
+                cls.active += 1
+                return
+
+        if len(cls.queue) >= cls.max_queue:
+            cls.shed["queue_full"] += 1
+            raise Shed("queue_full")
+
+        # An overloaded class only waits as long as the target delay
+        overloaded = cls.overloaded(now)
+        timeout = cls.target if overloaded else cls.max_wait
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (now, waiter)
+        cls.queue.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if entry not in cls.queue:
+                # Granted just as the wait ran out
+                return
+            cls.queue.remove(entry)
+            cls.record_sojourn(timeout, time.monotonic())
+            reason = "overloaded" if overloaded else "timeout"
+            cls.shed[reason] += 1
+            raise Shed(reason)
+        except asyncio.CancelledError:
+            # Give the slot back if it was granted before the cancellation
+            if entry in cls.queue:
+                cls.queue.remove(entry)
+            else:
+                self.release(name)
+            raise
+
+    def release(self, name: str):
+        self.classes[name].active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiting requests, highest priority first."""
+        now = time.monotonic()
+        for cls in self.by_priority:
+            while cls.queue and self._can_start(cls):
+                enqueued, waiter = cls.queue.popleft()
+                cls.record_sojourn(now - enqueued, now)
+                cls.active += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            name: {"active": cls.active, "queued": len(cls.queue), "shed": dict(cls.shed)}
+            for name, cls in self.classes.items()
+        }
+
+class AdmissionControl:
+    """
+    ASGI middleware applying an AdmissionController to HTTP requests.
+    `capacity` should not exceed the threadpool size, so every admitted
+    request for a sync route gets a thread straight away.
+    """
+
+    def __init__(self, app, capacity: int, config: dict = None):
+        self.app = app
+        config = config or load_config(ADMISSION_CONTROL)
+        self.enabled = config["enabled"]
+        capacity = min(config["capacity"] or capacity, capacity)
+        self.controller = AdmissionController(config, capacity)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope["method"], scope["path"])
+        try:
+            await self.controller.acquire(name)
+        except Shed as exc:
+            logger.debug("Shed %s %s (%s)", scope["method"], scope["path"], exc)
+            await self._reject(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name)
+
+    async def _reject(self, send):
+        body = b'{"detail":"Server is busy, please retry"}'
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(self.controller.retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,157 @@
+"""
+Write-behind audit log.
+
+Routes record events into an in-memory ring buffer, which costs a lock and
+an append instead of a commit. A background task in each worker writes
+them to audit_events in batched INSERTs, whenever AUDIT_BATCH_SIZE events
+are waiting or every AUDIT_FLUSH_SECONDS, and once more on shutdown. If
+the database falls behind and the ring fills up, the oldest events are
+overwritten and counted in `dropped`.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal
+from app.models.audit import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+# Events held in memory per worker before the oldest are dropped
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))
+# Events per INSERT; a full batch also triggers a flush
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
+
+def client_ip(request: Request) -> Optional[str]:
+    """Address of the client that sent the request."""
+    return request.client.host if request.client else None
+
+class AuditBuffer:
+    """
+    Bounded buffer of audit events. record() may be called from any thread;
+    flush() writes everything buffered so far.
+    """
+
+    def __init__(self, capacity: int = AUDIT_BUFFER_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 session_factory=SessionLocal):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self._session_factory = session_factory
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        # The background task and the shutdown flush may overlap
+        self._flush_lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.last_flush_at = None
+
+    def record(
+        self,
+        action: str,
+        actor: Optional[str] = None,
+        target: Optional[str] = None,
+        success: bool = True,
+        ip: Optional[str] = None,
+        details: Optional[dict] = None,
+    ):
+        """Buffer an event, e.g. record("product.update", "admin", "product:42")."""
+        event = {
+            "occurred_at": datetime.utcnow(),
+            "action": action,
+            "actor": actor[:100] if actor else actor,
+            "target": target,
+            "success": success,
+            "ip": ip,
+            "details": details,
+        }
+        with self._lock:
+            if len(self._events) == self.capacity:
+                self.dropped += 1
+            self._events.append(event)
+            self.recorded += 1
+            batch_ready = len(self._events) == self.batch_size
+
+        if batch_ready and self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # Event loop already closed; the shutdown flush picks these up
+                pass
+
+    def _requeue(self, batch: list):
+        """Put a batch that failed to write back in front, keeping the newest if there's no room."""
+        with self._lock:
+            room = self.capacity - len(self._events)
+            keep = batch[max(0, len(batch) - room):]
+            self.dropped += len(batch) - len(keep)
+            self._events.extendleft(reversed(keep))
+
+    def flush(self) -> int:
+        """Write all buffered events in batches. Returns the number written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+                if not batch:
+                    break
+
+                db = self._session_factory()
+                try:
+                    db.execute(insert(AuditEvent.__table__), batch)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    self._requeue(batch)
+                    self.failed_batches += 1
+                    raise
+                finally:
+                    db.close()
+                written += len(batch)
+                with self._lock:
+                    self.written += len(batch)
+            self.last_flush_at = datetime.utcnow()
+        return written
+
+    async def run(self, interval: float = AUDIT_FLUSH_SECONDS):
+        """Flush on a timer or when a batch fills up; meant to run as a background task in each worker."""
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception:
+                logger.exception("Audit log flush failed")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffered": len(self._events),
+                "capacity": self.capacity,
+                "recorded": self.recorded,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed_batches": self.failed_batches,
+                "last_flush_at": self.last_flush_at,
+            }
+
+# Process-wide audit buffer
+audit_buffer = AuditBuffer()
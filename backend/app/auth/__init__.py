@@ -2,15 +2,22 @@ from app.auth.jwt import (
     verify_password,
     get_password_hash,
     create_access_token,
+    create_refresh_token,
+    decode_token,
     get_current_user,
     get_current_active_user
 )
+from app.auth.revocation import revocation_list, revoke_token
 
 # Export all functions for easy importing
 __all__ = [
     "verify_password",
     "get_password_hash",
     "create_access_token",
+    "create_refresh_token",
+    "decode_token",
     "get_current_user",
-    "get_current_active_user"
-] 
\ No newline at end of file
+    "get_current_active_user",
+    "revocation_list",
+    "revoke_token"
+]
\ No newline at end of file
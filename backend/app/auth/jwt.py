@@ -1,4 +1,5 @@
 import os
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -11,11 +12,13 @@ from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models.user import User
 from app.schemas.user import TokenData
+from app.auth.revocation import revocation_list
 
 # To get a string like this run: openssl rand -hex 32
 SECRET_KEY = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = 7
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -31,19 +34,32 @@ def get_password_hash(password):
     """Generate a password hash for storing in the database."""
     return pwd_context.hash(password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Create a JWT access token with optional expiration time."""
+def _create_token(data: dict, token_type: str, expires_delta: timedelta):
+    """Encode a JWT of the given type with a fresh token id (jti), unless data has one."""
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    expire = datetime.utcnow() + expires_delta
+    to_encode.update({"exp": expire, "type": token_type})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current user based on the provided JWT token."""
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    """Create a JWT access token with optional expiration time."""
+    if not expires_delta:
+        expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return _create_token(data, "access", expires_delta)
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
+    """Create a long-lived JWT refresh token, only accepted by /auth/refresh."""
+    if not expires_delta:
+        expires_delta = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    return _create_token(data, "refresh", expires_delta)
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+    """
+    Decode and validate a JWT of the expected type.
+    Raises a 401 if the token is invalid, expired, of the wrong type or revoked.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -51,12 +67,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
+    
+    # Tokens issued before jti/type were added are plain access tokens
+    if payload.get("type", "access") != token_type or payload.get("sub") is None:
+        raise credentials_exception
+    
+    # Answered from memory, no database query
+    jti = payload.get("jti")
+    if jti is not None and revocation_list.is_revoked(jti):
+        raise credentials_exception
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Get current user based on the provided JWT token."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    payload = decode_token(token)
+    token_data = TokenData(username=payload["sub"])
         
     user = db.query(User).filter(User.username == token_data.username).first()
     if user is None:
@@ -67,4 +99,4 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     """Get current active user and verify active status."""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
\ No newline at end of file
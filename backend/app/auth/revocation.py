@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal
+from app.models.token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# How often each process pulls revocations made by other processes
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
+# Every Nth sync reloads the whole table, dropping expired ids and picking up
+# any rows an incremental sync skipped (ids can commit out of order)
+REVOCATION_FULL_SYNC_EVERY = 20
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings, using double hashing of a single
+    blake2b digest to derive the bit positions.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+class RevocationList:
+    """
+    In-memory mirror of the revoked_tokens table.
+
+    Lookups consult a Bloom filter first, so the common case (token not
+    revoked) is answered without touching the exact set or the database.
+    The exact set resolves Bloom false positives. Revocations made by this
+    process are visible immediately, others after the next sync.
+    """
+
+    def __init__(self, capacity: int = 1024, error_rate: float = 0.001):
+        self._lock = threading.Lock()
+        self._min_capacity = capacity
+        self._error_rate = error_rate
+        # (bloom, {jti: expires_at}) swapped as a unit so readers need no lock
+        self._state = (BloomFilter(capacity, error_rate), {})
+        self._last_id = 0
+        self._syncs = 0
+
+    def is_revoked(self, jti: str) -> bool:
+        """Check whether a token id has been revoked."""
+        bloom, revoked = self._state
+        if jti not in bloom:
+            return False
+        return jti in revoked
+
+    def add(self, jti: str, expires_at: datetime):
+        """Record a revocation locally."""
+        with self._lock:
+            bloom, revoked = self._state
+            if jti in revoked:
+                return
+            if len(revoked) >= bloom.capacity:
+                self._rebuild({**revoked, jti: expires_at})
+            else:
+                revoked[jti] = expires_at
+                bloom.add(jti)
+
+    def _rebuild(self, entries: dict):
+        """Replace the filter with one sized for the live (unexpired) entries."""
+        now = datetime.utcnow()
+        live = {jti: exp for jti, exp in entries.items() if exp > now}
+        bloom = BloomFilter(max(self._min_capacity, 2 * len(live)), self._error_rate)
+        for jti in live:
+            bloom.add(jti)
+        self._state = (bloom, live)
+
+    def sync(self):
+        """
+        Pull revocations from the database. Usually incremental; every
+        REVOCATION_FULL_SYNC_EVERY calls it reloads everything and purges
+        expired rows.
+        """
+        full = self._syncs % REVOCATION_FULL_SYNC_EVERY == 0
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            query = db.query(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+            if full:
+                db.query(RevokedToken).filter(
+                    RevokedToken.expires_at <= now
+                ).delete(synchronize_session=False)
+                db.commit()
+                rows = query.all()
+            else:
+                rows = query.filter(RevokedToken.id > self._last_id).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            bloom, revoked = self._state
+            if full:
+                # Keep local entries too: they may have committed after the query ran
+                self._rebuild({**revoked, **{row.jti: row.expires_at for row in rows}})
+            else:
+                entries = {row.jti: row.expires_at for row in rows if row.jti not in revoked}
+                if len(revoked) + len(entries) > bloom.capacity:
+                    self._rebuild({**revoked, **entries})
+                else:
+                    for jti, expires_at in entries.items():
+                        revoked[jti] = expires_at
+                        bloom.add(jti)
+            if rows:
+                self._last_id = max(self._last_id, max(row.id for row in rows))
+            self._syncs += 1
+
+    async def run(self, interval: int = REVOCATION_SYNC_SECONDS):
+        """Sync forever; meant to run as a background task in each worker."""
+        while True:
+            try:
+                await run_in_threadpool(self.sync)
+            except Exception:
+                logger.exception("Revocation list sync failed")
+            await asyncio.sleep(interval)
+
+# Process-wide revocation list
+revocation_list = RevocationList()
+
+def revoke_token(db: Session, jti: str, token_type: str, expires_at: datetime) -> bool:
+    """
+    Revoke a token id. Returns False if it was already revoked, which the
+    unique constraint on jti detects even across processes.
+    """
+    db.add(RevokedToken(jti=jti, token_type=token_type, expires_at=expires_at))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    revocation_list.add(jti, expires_at)
+    return True
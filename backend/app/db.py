@@ -1,7 +1,6 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import declarative_base, sessionmaker
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,7 +11,7 @@ DB_TYPE = os.getenv("DB_TYPE", "sqlite")
 
 if DB_TYPE == "sqlite":
     # Use SQLite for testing
-    SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+    SQLALCHEMY_DATABASE_URL = os.getenv("SQLITE_DATABASE_URL", "sqlite:///./test.db")
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
     )
@@ -34,6 +33,31 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create base class for models
 Base = declarative_base()
 
+def check_schema(bind, metadata):
+    """
+    Fail fast if an existing table lacks columns the models use. create_all
+    only creates missing tables, so such a database needs Alembic instead.
+    Run this before create_all.
+    """
+    inspector = inspect(bind)
+    outdated = []
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column.name for column in table.columns if column.name not in existing]
+        if missing:
+            outdated.append(f"{table.name} (missing {', '.join(missing)})")
+    if outdated:
+        # Tables an older create_all made match revision 0001, or 0002 once
+        # revoked_tokens existed
+        revision = "0002" if inspector.has_table("revoked_tokens") else "0001"
+        raise RuntimeError(
+            "Database schema is out of date: " + "; ".join(outdated) + ". "
+            "Upgrade it with Alembic; for a database created by an older version of the app, "
+            f"run `alembic stamp {revision} && alembic upgrade head` (see README)."
+        )
+
 # Database dependency
 def get_db():
     """
@@ -0,0 +1,136 @@
+"""
+Helpers for Alembic migrations that must run against a live database.
+
+Building an index or backfilling a column in one statement locks the
+table for as long as it takes. These helpers do the same work in ways
+that keep the table writable: concurrent index builds on Postgres, and
+backfills split into small, separately committed batches. Every helper
+is safe to re-run, so a migration interrupted half way can simply be
+started again.
+"""
+import logging
+import os
+import time
+
+import sqlalchemy as sa
+from alembic import op
+
+logger = logging.getLogger("alembic.online")
+
+# Defaults, overridable per run from the environment
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "5000"))
+BACKFILL_PAUSE = float(os.getenv("BACKFILL_PAUSE", "0.05"))
+PROGRESS_INTERVAL = 5.0
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+def has_column(table_name: str, column_name: str) -> bool:
+    """Check whether a column already exists."""
+    columns = sa.inspect(op.get_bind()).get_columns(table_name)
+    return any(column["name"] == column_name for column in columns)
+
+def add_column_if_missing(table_name: str, column: sa.Column):
+    """Add a nullable column unless an earlier, interrupted run already did."""
+    if not has_column(table_name, column.name):
+        op.add_column(table_name, column)
+
+def create_index_concurrently(index_name: str, table_name: str, columns: list, unique: bool = False):
+    """
+    Build an index without blocking writes to the table.
+
+    On Postgres this is CREATE INDEX CONCURRENTLY, which can't run inside a
+    transaction, so the migration's transaction is committed first. A
+    failed concurrent build leaves an INVALID index behind; that is dropped
+    and rebuilt. Other databases get a plain CREATE INDEX.
+    """
+    if not _is_postgres():
+        op.create_index(index_name, table_name, columns, unique=unique, if_not_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        invalid = op.get_bind().execute(sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": index_name}).first()
+        if invalid:
+            logger.info("Dropping invalid index %s left by an earlier run", index_name)
+            op.drop_index(index_name, table_name, postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            index_name, table_name, columns, unique=unique,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+def drop_index_concurrently(index_name: str, table_name: str):
+    """Drop an index without blocking writes (on Postgres)."""
+    if not _is_postgres():
+        op.drop_index(index_name, table_name, if_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(index_name, table_name, postgresql_concurrently=True, if_exists=True)
+
+def backfill(
+    table: sa.Table,
+    values: dict,
+    where,
+    key: str = "id",
+    batch_size: int = None,
+    pause: float = None,
+) -> int:
+    """
+    UPDATE `table` SET `values` for every row matching `where`, in batches.
+
+    Rows are walked in order of the unique `key` column, batch_size at a
+    time, and each batch is its own transaction, so locks are held only briefly and
+    finished batches survive an interruption. `where` must stop matching a
+    row once it has been filled (e.g. "column IS NULL"): that is what lets
+    a re-run resume where the last one stopped. `pause` seconds are slept
+    between batches to leave room for application traffic. Returns the
+    number of rows updated.
+    """
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    pause = BACKFILL_PAUSE if pause is None else pause
+    key = table.c[key]
+    bind = op.get_bind()
+
+    total = bind.execute(sa.select(sa.func.count()).select_from(table).where(where)).scalar()
+    logger.info("Backfilling %s rows of %s in batches of %s", total, table.name, batch_size)
+    if not total:
+        return 0
+
+    done = 0
+    last_key = None
+    start = last_report = time.monotonic()
+    with op.get_context().autocommit_block():
+        while True:
+            query = sa.select(key).where(where).order_by(key).limit(batch_size)
+            if last_key is not None:
+                query = query.where(key > last_key)
+            keys = bind.execute(query).scalars().all()
+            if not keys:
+                break
+
+            # Autocommit: each batch UPDATE is its own short transaction
+            bind.execute(
+                sa.update(table)
+                .where(key >= keys[0], key <= keys[-1], where)
+                .values(values)
+            )
+            done += len(keys)
+            last_key = keys[-1]
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                rate = done / (now - start)
+                remaining = max(total - done, 0) / rate if rate else 0
+                logger.info(
+                    "%s: %s/%s rows (%.0f%%), %.0f rows/s, about %.0fs left",
+                    table.name, done, total, 100 * done / total, rate, remaining,
+                )
+                last_report = now
+            if pause:
+                time.sleep(pause)
+
+    logger.info("Backfilled %s rows of %s in %.1fs", done, table.name, time.monotonic() - start)
+    return done
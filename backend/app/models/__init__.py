@@ -1,5 +1,9 @@
 from app.models.user import User
 from app.models.product import Product
+from app.models.token import RevokedToken
+from app.models.sequence import ChangeSequence
+from app.models.related import RelatedProduct
+from app.models.audit import AuditEvent
 
 # Export all models for easy importing
-__all__ = ["User", "Product"] 
\ No newline at end of file
+__all__ = ["User", "Product", "RevokedToken", "ChangeSequence", "RelatedProduct", "AuditEvent"]
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Index
+from app.db import Base
+
+class AuditEvent(Base):
+    """
+    Audit trail of admin product changes and login attempts. Rows are
+    written in batches by app.audit and read newest first, keyset paged on
+    id; the composite indexes serve the filtered pages.
+    """
+    __tablename__ = "audit_events"
+    __table_args__ = (
+        Index("ix_audit_events_action_id", "action", "id"),
+        Index("ix_audit_events_actor_id", "actor", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    # When the event happened, not when its batch was written
+    occurred_at = Column(DateTime, nullable=False)
+    action = Column(String(50), nullable=False)
+    actor = Column(String(100), nullable=True)
+    target = Column(String(100), nullable=True)
+    success = Column(Boolean, nullable=False, default=True)
+    ip = Column(String(45), nullable=True)
+    details = Column(JSON, nullable=True)
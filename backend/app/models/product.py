@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Text, Integer, ForeignKey
+from sqlalchemy import Column, String, Float, Text, Integer, BigInteger, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
 
@@ -7,6 +7,10 @@ class Product(BaseModel):
     Product model for storing product details in the e-commerce application.
     """
     __tablename__ = "products"
+    __table_args__ = (
+        # Nearest-price neighbours within a category, for related products
+        Index("ix_products_category_price", "category", "price"),
+    )
     
     name = Column(String(100), nullable=False, index=True)
     description = Column(Text, nullable=True)
@@ -15,6 +19,11 @@ class Product(BaseModel):
     image_url = Column(String(255), nullable=True)
     category = Column(String(50), nullable=True, index=True)
     
+    # Soft delete: deleted products stay as tombstones for the change feed
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Position in the catalog change feed, bumped on every create/update/delete
+    change_seq = Column(BigInteger, nullable=True, unique=True, index=True)
+    
     # Optional: Add a relationship to User (as creator/owner)
     # creator_id = Column(Integer, ForeignKey("users.id"))
     # creator = relationship("User", back_populates="products") 
\ No newline at end of file
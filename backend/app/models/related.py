@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, SmallInteger, Float, ForeignKey
+from app.db import Base
+
+class RelatedProduct(Base):
+    """
+    Precomputed top-K related products, one row per (product, rank).
+    Maintained by app.related; the primary key serves the lookup.
+    """
+    __tablename__ = "related_products"
+    
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    rank = Column(SmallInteger, primary_key=True)
+    related_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, BigInteger
+from app.db import Base
+
+class ChangeSequence(Base):
+    """
+    Named counters for change feeds. Bumping a counter locks its row until
+    the transaction commits, so values are handed out in commit order.
+    """
+    __tablename__ = "change_sequences"
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
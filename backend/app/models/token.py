@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from app.models.base import BaseModel
+
+class RevokedToken(BaseModel):
+    """
+    Revoked JWT ids (jti). Rows can be purged once the token has expired.
+    """
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(32), unique=True, index=True, nullable=False)
+    token_type = Column(String(10), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
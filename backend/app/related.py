@@ -0,0 +1,235 @@
+"""
+Related products.
+
+For every live product we keep its top RELATED_K neighbours in the
+related_products table, scored on shared category, price proximity and
+token overlap of name and description. rebuild_related() recomputes the
+whole table in one pass over the catalog; refresh_related() patches it
+after a single product changes, so the read path is always one indexed
+lookup.
+"""
+import heapq
+import logging
+import re
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.models.related import RelatedProduct
+
+logger = logging.getLogger(__name__)
+
+RELATED_K = 8
+# Same-category products considered on each side of a product's price
+PRICE_WINDOW = 25
+# Tokens shared by more products than this say nothing about similarity
+MAX_TOKEN_PRODUCTS = 500
+MAX_TOKEN_CANDIDATES = 200
+
+CATEGORY_WEIGHT = 0.5
+PRICE_WEIGHT = 0.2
+TEXT_WEIGHT = 0.3
+
+_TOKEN_RE = re.compile(r"[a-z0-9]{3,}")
+_STOPWORDS = frozenset("the and for with this that from your are was you".split())
+
+products_table = Product.__table__
+related_table = RelatedProduct.__table__
+
+_Item = namedtuple("_Item", "id category price tokens")
+
+_ITEM_COLUMNS = (
+    products_table.c.id,
+    products_table.c.category,
+    products_table.c.price,
+    products_table.c.name,
+    products_table.c.description,
+)
+
+def _tokens(name, description):
+    text = f"{name} {description or ''}".lower()
+    return frozenset(token for token in _TOKEN_RE.findall(text) if token not in _STOPWORDS)
+
+def _item(row) -> _Item:
+    return _Item(row.id, row.category, row.price, _tokens(row.name, row.description))
+
+def score(a: _Item, b: _Item) -> float:
+    """Similarity of two products, between 0 and 1."""
+    same_category = a.category is not None and a.category == b.category
+    high = max(a.price, b.price)
+    price = 1 - abs(a.price - b.price) / high if high > 0 else 1.0
+    union = len(a.tokens | b.tokens)
+    text = len(a.tokens & b.tokens) / union if union else 0.0
+    return CATEGORY_WEIGHT * same_category + PRICE_WEIGHT * price + TEXT_WEIGHT * text
+
+def _top(item: _Item, candidates) -> list:
+    """Best RELATED_K (score, id) pairs for item among candidates."""
+    scored = ((score(item, other), other.id) for other in candidates if other.id != item.id)
+    return heapq.nlargest(RELATED_K, scored)
+
+def compute_related(items: list) -> dict:
+    """
+    Top neighbours for every item. Candidates are the PRICE_WINDOW nearest
+    prices in the same category plus products sharing a selective token,
+    so the cost grows with the catalog size rather than its square.
+    """
+    by_category = defaultdict(list)
+    postings = defaultdict(list)
+    for item in items:
+        by_category[item.category].append(item)
+        for token in item.tokens:
+            postings[token].append(item)
+    for bucket in by_category.values():
+        bucket.sort(key=lambda item: item.price)
+    prices = {category: [item.price for item in bucket] for category, bucket in by_category.items()}
+
+    related = {}
+    for item in items:
+        bucket = by_category[item.category]
+        pos = bisect_left(prices[item.category], item.price)
+        candidates = {other.id: other for other in bucket[max(0, pos - PRICE_WINDOW):pos + PRICE_WINDOW + 1]}
+        from_tokens = 0
+        for token in item.tokens:
+            posting = postings[token]
+            if len(posting) > MAX_TOKEN_PRODUCTS:
+                continue
+            for other in posting:
+                if from_tokens >= MAX_TOKEN_CANDIDATES:
+                    break
+                if other.id not in candidates:
+                    candidates[other.id] = other
+                    from_tokens += 1
+        related[item.id] = _top(item, candidates.values())
+    return related
+
+def _rows(product_id: int, top: list) -> list:
+    return [
+        {"product_id": product_id, "rank": rank, "related_id": related_id, "score": value}
+        for rank, (value, related_id) in enumerate(top)
+    ]
+
+def rebuild_related(db: Session, batch_size: int = 5000) -> int:
+    """Recompute the whole related_products table. Returns the number of rows written."""
+    items = [
+        _item(row) for row in
+        db.execute(select(*_ITEM_COLUMNS).where(products_table.c.deleted_at.is_(None)))
+    ]
+    rows = [row for item_id, top in compute_related(items).items() for row in _rows(item_id, top)]
+
+    db.execute(delete(related_table))
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(related_table), rows[start:start + batch_size])
+    db.commit()
+    return len(rows)
+
+def _neighbourhood(db: Session, product: _Item) -> dict:
+    """Live products near `product` in price within its category, by id."""
+    live = products_table.c.deleted_at.is_(None)
+    same_category = (
+        products_table.c.category == product.category if product.category is not None
+        else products_table.c.category.is_(None)
+    )
+    above = (
+        select(*_ITEM_COLUMNS)
+        .where(same_category, live, products_table.c.price >= product.price)
+        .order_by(products_table.c.price)
+        .limit(PRICE_WINDOW + 1)
+    )
+    below = (
+        select(*_ITEM_COLUMNS)
+        .where(same_category, live, products_table.c.price < product.price)
+        .order_by(products_table.c.price.desc())
+        .limit(PRICE_WINDOW)
+    )
+    rows = list(db.execute(above)) + list(db.execute(below))
+    return {row.id: _item(row) for row in rows}
+
+def _load_items(db: Session, ids) -> dict:
+    if not ids:
+        return {}
+    rows = db.execute(
+        select(*_ITEM_COLUMNS).where(products_table.c.id.in_(ids), products_table.c.deleted_at.is_(None))
+    )
+    return {row.id: _item(row) for row in rows}
+
+def _replace(db: Session, product_id: int, top: list):
+    """
+    Store `top` as the list of `product_id`. Ranks are upserted rather than
+    deleted and re-inserted, so concurrent refreshes writing the same list
+    don't collide on the (product_id, rank) key; the last one wins.
+    """
+    db.execute(delete(related_table).where(
+        related_table.c.product_id == product_id, related_table.c.rank >= len(top)
+    ))
+    if top:
+        dialect_insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+        stmt = dialect_insert(related_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[related_table.c.product_id, related_table.c.rank],
+            set_={"related_id": stmt.excluded.related_id, "score": stmt.excluded.score},
+        )
+        db.execute(stmt, _rows(product_id, top))
+
+def refresh_related(db: Session, product_id: int):
+    """
+    Update related products after `product_id` was created, changed or
+    deleted: recompute its own list, then merge it into (or drop it from)
+    the lists of the products around it. Cross-category text matches are
+    left to the next rebuild_related() run.
+    """
+    links = db.execute(
+        select(related_table.c.product_id, related_table.c.related_id, related_table.c.score)
+        .where(or_(related_table.c.product_id == product_id, related_table.c.related_id == product_id))
+    ).all()
+    current = _load_items(db, [product_id])
+    product = current.get(product_id)
+
+    # Products whose lists mention this one
+    referrers = {link.product_id for link in links if link.related_id == product_id}
+
+    if product is None:
+        # Deleted: drop its list and refill the lists it appeared in
+        _replace(db, product_id, [])
+        for referrer in _load_items(db, referrers).values():
+            _replace(db, referrer.id, _top(referrer, _neighbourhood(db, referrer).values()))
+        db.commit()
+        return
+
+    neighbours = _neighbourhood(db, product)
+    listed = {link.related_id for link in links if link.product_id == product_id}
+    neighbours.update(_load_items(db, (listed | referrers) - neighbours.keys()))
+    _replace(db, product_id, _top(product, neighbours.values()))
+
+    # Merge the new score into each neighbour's list, keeping the best K
+    others = [item for item in neighbours.values() if item.id != product_id]
+    lists = defaultdict(list)
+    for link in db.execute(
+        select(related_table.c.product_id, related_table.c.related_id, related_table.c.score)
+        .where(related_table.c.product_id.in_([item.id for item in others]))
+    ):
+        lists[link.product_id].append((link.score, link.related_id))
+    for other in others:
+        entries = sorted(lists[other.id], reverse=True)
+        merged = heapq.nlargest(RELATED_K, [
+            entry for entry in entries if entry[1] != product_id
+        ] + [(score(other, product), product_id)])
+        if merged != entries:
+            _replace(db, other.id, merged)
+    db.commit()
+
+def refresh_related_products(bind, product_id: int):
+    """
+    Background task wrapper around refresh_related with its own session.
+    A failed refresh (e.g. a deadlock with a concurrent one) is logged and
+    left for the next rebuild_related() run.
+    """
+    with Session(bind=bind) as db:
+        try:
+            refresh_related(db, product_id)
+        except Exception:
+            db.rollback()
+            logger.exception("Refreshing related products for product %s failed", product_id)
@@ -1,4 +1,4 @@
-from app.routes import auth, products
+from app.routes import auth, products, audit
 
 # Export all routers for easy importing
-__all__ = ["auth", "products"] 
\ No newline at end of file
+__all__ = ["auth", "products", "audit"] 
\ No newline at end of file
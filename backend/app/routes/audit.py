@@ -0,0 +1,69 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.audit import audit_buffer
+from app.db import get_db
+from app.models.audit import AuditEvent
+from app.models.user import User
+from app.schemas.audit import AuditEvents, AuditStats
+from app.auth.jwt import get_current_active_user
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+audit_table = AuditEvent.__table__
+
+@router.get("/", response_model=AuditEvents)
+def get_audit_events(
+    before: Optional[int] = Query(None, ge=1),
+    limit: int = Query(100, ge=1, le=500),
+    action: Optional[str] = None,
+    actor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    Audit events, newest first, optionally only one `action` (e.g.
+    auth.login) or `actor`. Pass `next_before` back in as `before` to fetch
+    the next page. Events reach the table in batches, up to a few seconds
+    after they happen.
+    """
+    # Check if user is admin
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    query = select(audit_table).order_by(audit_table.c.id.desc()).limit(limit + 1)
+    if before is not None:
+        query = query.where(audit_table.c.id < before)
+    if action:
+        query = query.where(audit_table.c.action == action)
+    if actor:
+        query = query.where(audit_table.c.actor == actor)
+    rows = db.execute(query).all()
+    
+    events = rows[:limit]
+    has_more = len(rows) > limit
+    return {
+        "events": events,
+        "next_before": events[-1].id if has_more else None,
+        "has_more": has_more,
+    }
+
+@router.get("/stats", response_model=AuditStats)
+def get_audit_stats(current_user: User = Depends(get_current_active_user)) -> Any:
+    """
+    Buffer counters of the worker that serves this request, including
+    events dropped because the buffer overflowed.
+    """
+    # Check if user is admin
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return audit_buffer.stats()
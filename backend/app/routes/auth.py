@@ -1,58 +1,80 @@
-from datetime import timedelta
-from typing import Any
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import insert, or_
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.models.user import User
-from app.schemas.user import User as UserSchema, UserCreate, Token
+from app.schemas.user import User as UserSchema, UserCreate, Token, TokenRefresh
 from app.auth.jwt import (
     verify_password,
     get_password_hash,
     create_access_token,
+    create_refresh_token,
+    decode_token,
+    oauth2_scheme,
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
     get_current_active_user
 )
+from app.auth.revocation import revoke_token
+from app.audit import audit_buffer, client_ip
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _issue_tokens(username: str) -> dict:
+    """Create a new access/refresh token pair for a user."""
+    # The access token carries its refresh token's id (sid), so logging out
+    # can revoke both
+    session_id = uuid.uuid4().hex
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": username, "sid": session_id}, expires_delta=access_token_expires
+    )
+    refresh_token = create_refresh_token(data={"sub": username, "jti": session_id})
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
 @router.post("/register", response_model=UserSchema)
 def register_user(user_in: UserCreate, db: Session = Depends(get_db)) -> Any:
     """
     Register a new user.
     """
-    # Check if user with this email already exists
-    user = db.query(User).filter(User.email == user_in.email).first()
-    if user:
+    # Check if a user with this email or username already exists, in one query
+    existing = db.query(User.email, User.username).filter(
+        or_(User.email == user_in.email, User.username == user_in.username)
+    ).limit(2).all()
+    if any(user.email == user_in.email for user in existing):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this email already exists"
         )
-    
-    # Check if user with this username already exists
-    user = db.query(User).filter(User.username == user_in.username).first()
-    if user:
+    if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this username already exists"
         )
     
-    # Create new user
-    db_user = User(
-        email=user_in.email,
-        username=user_in.username,
-        full_name=user_in.full_name,
-        hashed_password=get_password_hash(user_in.password)
-    )
-    db.add(db_user)
+    # Create new user, getting the stored row back from the INSERT
+    db_user = db.execute(
+        insert(User.__table__)
+        .values(
+            email=user_in.email,
+            username=user_in.username,
+            full_name=user_in.full_name,
+            hashed_password=get_password_hash(user_in.password)
+        )
+        .returning(User.__table__)
+    ).one()
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 @router.post("/token", response_model=Token)
 def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
@@ -68,19 +90,76 @@ def login_for_access_token(
     
     # Verify user and password
     if not user or not verify_password(form_data.password, user.hashed_password):
+        audit_buffer.record("auth.login", form_data.username, success=False, ip=client_ip(request))
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+    audit_buffer.record("auth.login", user.username, ip=client_ip(request))
+    
+    # Create access and refresh tokens
+    return _issue_tokens(user.username)
+
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(token_in: TokenRefresh, db: Session = Depends(get_db)) -> Any:
+    """
+    Exchange a refresh token for a new token pair, without re-entering the password.
+    The refresh token is rotated: each one can only be used once.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
     )
+    payload = decode_token(token_in.refresh_token, token_type="refresh")
+    
+    user = db.query(User).filter(User.username == payload["sub"]).first()
+    if not user or not user.is_active:
+        raise credentials_exception
+    
+    # Revoking the old token fails if it was already used, even by another
+    # process whose revocation hasn't been synced to us yet
+    expires_at = datetime.utcfromtimestamp(payload["exp"])
+    if not revoke_token(db, payload["jti"], "refresh", expires_at):
+        raise credentials_exception
+    
+    return _issue_tokens(payload["sub"])
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    token_in: Optional[TokenRefresh] = None,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Revoke the current access token and the refresh token issued with it.
+    A refresh token given in the body is revoked too.
+    """
+    # Validate everything before revoking anything, so a bad request
+    # leaves the session as it was
+    payload = decode_token(token)
+    refresh_payload = None
+    if token_in:
+        refresh_payload = decode_token(token_in.refresh_token, token_type="refresh")
+        if refresh_payload["sub"] != payload["sub"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Refresh token belongs to another user"
+            )
+    
+    if payload.get("jti"):
+        revoke_token(db, payload["jti"], "access", datetime.utcfromtimestamp(payload["exp"]))
+    if refresh_payload:
+        expires_at = datetime.utcfromtimestamp(refresh_payload["exp"])
+        revoke_token(db, refresh_payload["jti"], "refresh", expires_at)
+    if payload.get("sid") and (not refresh_payload or payload["sid"] != refresh_payload["jti"]):
+        # The refresh token can't outlive this; revoke_token ignores repeats
+        expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        revoke_token(db, payload["sid"], "refresh", expires_at)
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.get("/me", response_model=UserSchema)
 def read_users_me(current_user: User = Depends(get_current_active_user)) -> Any:
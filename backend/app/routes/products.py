@@ -1,39 +1,134 @@
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.models.product import Product
+from app.models.related import RelatedProduct
+from app.models.sequence import ChangeSequence
 from app.models.user import User
-from app.schemas.product import Product as ProductSchema, ProductCreate, ProductUpdate
+from app.schemas.product import (
+    Product as ProductSchema, ProductCreate, ProductUpdate, ProductPatch, ProductChanges,
+    PRODUCT_FIELDS, product_fields_model
+)
 from app.auth.jwt import get_current_active_user
+from app.related import refresh_related_products
+from app.audit import audit_buffer, client_ip
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+# Writes return the affected row with RETURNING instead of re-selecting it
+products_table = Product.__table__
+
+def _next_change_seq(db: Session) -> int:
+    """
+    Take the next catalog change number. The upsert creates the counter on
+    first use and holds its row lock until commit, so product writes commit
+    in change_seq order and the feed never skips over a late commit.
+    """
+    dialect_insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    table = ChangeSequence.__table__
+    stmt = dialect_insert(table).values(name="products", value=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.name], set_={"value": table.c.value + 1}
+    ).returning(table.c.value)
+    return db.execute(stmt).scalar_one()
+
+FIELDS_DESCRIPTION = (
+    "Comma-separated product fields to return, e.g. name,price. One of: "
+    + ", ".join(PRODUCT_FIELDS)
+    + ". id is always included. When given, each product in the response has"
+    " only id and these fields, not the full Product schema shown below;"
+    " unknown fields are a 400."
+)
+
+def _parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    """
+    Validate a ?fields= list. Returns the fields in a canonical order (id
+    first, then schema order), or None when `fields` wasn't given.
+    """
+    if fields is None:
+        return None
+    
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(PRODUCT_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return ("id",) + tuple(name for name in PRODUCT_FIELDS if name in requested and name != "id")
+
+def _select_fields(projection: Optional[tuple]):
+    """SELECT of just the requested product columns."""
+    return select(*(products_table.c[name] for name in projection or PRODUCT_FIELDS))
+
+def _project(projection: tuple, row):
+    """Build the response model for this projection from a row."""
+    return product_fields_model(projection)(**row._mapping)
+
 @router.get("/", response_model=List[ProductSchema])
 def get_products(
     skip: int = 0, 
     limit: int = 100,
     category: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db)
 ) -> Any:
     """
-    Retrieve products.
+    Retrieve products. Use `fields` to fetch only some columns, e.g. for
+    grid views that don't show the description. Projected products are
+    objects with just `id` and the requested fields, so they don't match
+    the documented response model.
     """
-    query = db.query(Product)
+    projection = _parse_fields(fields)
+    query = _select_fields(projection).where(products_table.c.deleted_at.is_(None))
     
     # Apply category filter if provided
     if category:
-        query = query.filter(Product.category == category)
+        query = query.where(products_table.c.category == category)
     
     # Apply pagination
-    products = query.offset(skip).limit(limit).all()
+    products = db.execute(query.offset(skip).limit(limit)).all()
+    if projection:
+        return JSONResponse(jsonable_encoder([_project(projection, row) for row in products]))
     return products
 
+@router.get("/changes", response_model=ProductChanges)
+def get_product_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Products created, updated or deleted after change number `since`, oldest
+    first. Deleted products come back with `deleted_at` set. Pass `next_since`
+    back in to fetch the next page; numbers may have gaps.
+    """
+    rows = db.execute(
+        select(products_table)
+        .where(products_table.c.change_seq > since)
+        .order_by(products_table.c.change_seq)
+        .limit(limit + 1)
+    ).all()
+    
+    changes = rows[:limit]
+    return {
+        "changes": changes,
+        "next_since": changes[-1].change_seq if changes else since,
+        "has_more": len(rows) > limit,
+    }
+
 @router.post("/", response_model=ProductSchema)
 def create_product(
     product_in: ProductCreate, 
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -47,36 +142,93 @@ def create_product(
             detail="Not enough permissions"
         )
     
-    product = Product(
-        name=product_in.name,
-        description=product_in.description,
-        price=product_in.price,
-        stock=product_in.stock,
-        image_url=product_in.image_url,
-        category=product_in.category,
-    )
-    db.add(product)
+    # Read before the commit expires the user row
+    actor = current_user.username
+    product = db.execute(
+        insert(products_table)
+        .values(**product_in.dict(), change_seq=_next_change_seq(db))
+        .returning(products_table)
+    ).one()
     db.commit()
-    db.refresh(product)
+    audit_buffer.record("product.create", actor, f"product:{product.id}", ip=client_ip(request))
+    background_tasks.add_task(refresh_related_products, db.get_bind(), product.id)
     return product
 
 @router.get("/{product_id}", response_model=ProductSchema)
-def get_product(product_id: int, db: Session = Depends(get_db)) -> Any:
+def get_product(
+    product_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db)
+) -> Any:
     """
-    Get product by ID.
+    Get product by ID, optionally only the given `fields`. A projected
+    product is an object with just `id` and the requested fields, not the
+    full documented response model.
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
+    projection = _parse_fields(fields)
+    product = db.execute(
+        _select_fields(projection)
+        .where(products_table.c.id == product_id, products_table.c.deleted_at.is_(None))
+    ).first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
+    if projection:
+        return JSONResponse(jsonable_encoder(_project(projection, product)))
+    return product
+
+@router.get("/{product_id}/related", response_model=List[ProductSchema])
+def get_related_products(product_id: int, db: Session = Depends(get_db)) -> Any:
+    """
+    Get precomputed related products, best match first.
+    """
+    related = db.query(Product).join(
+        RelatedProduct, RelatedProduct.related_id == Product.id
+    ).filter(
+        RelatedProduct.product_id == product_id, Product.deleted_at.is_(None)
+    ).order_by(RelatedProduct.rank).all()
+    
+    # Only an empty list needs a second query, to tell a product without
+    # neighbours from one that doesn't exist
+    if not related and not db.query(Product.id).filter(
+        Product.id == product_id, Product.deleted_at.is_(None)
+    ).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+    return related
+
+def _update_product(product_id: int, values: dict, db: Session):
+    """Apply an update in a single UPDATE ... RETURNING statement."""
+    live = (products_table.c.id == product_id) & products_table.c.deleted_at.is_(None)
+    if not values:
+        product = db.execute(select(products_table).where(live)).first()
+    else:
+        product = db.execute(
+            update(products_table)
+            .where(live)
+            .values(**values, change_seq=_next_change_seq(db))
+            .returning(products_table)
+        ).first()
+    
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+    
+    db.commit()
     return product
 
 @router.put("/{product_id}", response_model=ProductSchema)
 def update_product(
     product_id: int,
     product_in: ProductUpdate,
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -90,30 +242,56 @@ def update_product(
             detail="Not enough permissions"
         )
     
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+    actor = current_user.username
+    values = product_in.dict(exclude_unset=True)
+    product = _update_product(product_id, values, db)
+    audit_buffer.record(
+        "product.update", actor, f"product:{product_id}",
+        ip=client_ip(request), details={"fields": sorted(values)}
+    )
+    background_tasks.add_task(refresh_related_products, db.get_bind(), product_id)
+    return product
+
+@router.patch("/{product_id}", response_model=ProductSchema)
+def patch_product(
+    product_id: int,
+    product_in: ProductPatch,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    Partially update a product. Only the fields sent are changed.
+    """
+    # Check if user is admin
+    if not current_user.is_admin:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
         )
     
-    update_data = product_in.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(product, field, value)
-    
-    db.add(product)
-    db.commit()
-    db.refresh(product)
+    actor = current_user.username
+    values = product_in.dict(exclude_unset=True)
+    product = _update_product(product_id, values, db)
+    audit_buffer.record(
+        "product.patch", actor, f"product:{product_id}",
+        ip=client_ip(request), details={"fields": sorted(values)}
+    )
+    background_tasks.add_task(refresh_related_products, db.get_bind(), product_id)
     return product
 
 @router.delete("/{product_id}", response_model=ProductSchema)
 def delete_product(
     product_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
-    Delete a product.
+    Delete a product. The row is kept as a tombstone so the change feed can
+    report the deletion.
     """
     # Check if user is admin
     if not current_user.is_admin:
@@ -122,13 +300,8 @@ def delete_product(
             detail="Not enough permissions"
         )
     
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
-        )
-    
-    db.delete(product)
-    db.commit()
-    return product 
\ No newline at end of file
+    actor = current_user.username
+    product = _update_product(product_id, {"deleted_at": func.now()}, db)
+    audit_buffer.record("product.delete", actor, f"product:{product_id}", ip=client_ip(request))
+    background_tasks.add_task(refresh_related_products, db.get_bind(), product_id)
+    return product
\ No newline at end of file
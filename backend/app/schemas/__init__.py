@@ -1,8 +1,14 @@
-from app.schemas.user import User, UserCreate, UserUpdate, UserInDB, Token, TokenData
-from app.schemas.product import Product, ProductCreate, ProductUpdate, ProductInDB
+from app.schemas.user import User, UserCreate, UserUpdate, UserInDB, Token, TokenData, TokenRefresh
+from app.schemas.product import (
+    Product, ProductCreate, ProductUpdate, ProductPatch, ProductInDB, ProductChange, ProductChanges,
+    PRODUCT_FIELDS, product_fields_model
+)
+from app.schemas.audit import AuditEvent, AuditEvents, AuditStats
 
 # Export all schemas for easy importing
 __all__ = [
-    "User", "UserCreate", "UserUpdate", "UserInDB", "Token", "TokenData",
-    "Product", "ProductCreate", "ProductUpdate", "ProductInDB"
+    "User", "UserCreate", "UserUpdate", "UserInDB", "Token", "TokenData", "TokenRefresh",
+    "Product", "ProductCreate", "ProductUpdate", "ProductPatch", "ProductInDB",
+    "ProductChange", "ProductChanges", "PRODUCT_FIELDS", "product_fields_model",
+    "AuditEvent", "AuditEvents", "AuditStats"
 ] 
\ No newline at end of file
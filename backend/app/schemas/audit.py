@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+# Properties to return via API
+class AuditEvent(BaseModel):
+    id: int
+    occurred_at: datetime
+    action: str
+    actor: Optional[str] = None
+    target: Optional[str] = None
+    success: bool
+    ip: Optional[str] = None
+    details: Optional[Dict[str, Any]] = None
+    
+    class Config:
+        orm_mode = True
+
+# One page of audit events, newest first
+class AuditEvents(BaseModel):
+    events: List[AuditEvent]
+    next_before: Optional[int] = None
+    has_more: bool
+
+# Counters of this worker's audit buffer
+class AuditStats(BaseModel):
+    buffered: int
+    capacity: int
+    recorded: int
+    written: int
+    dropped: int
+    failed_batches: int
+    last_flush_at: Optional[datetime] = None
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from functools import lru_cache
+from pydantic import BaseModel, Field, create_model, validator
+from typing import List, Optional, Tuple, Type, get_type_hints
 from datetime import datetime
 
 # Shared properties
@@ -21,6 +22,15 @@ class ProductUpdate(ProductBase):
     price: Optional[float] = Field(None, gt=0) 
     stock: Optional[int] = Field(None, ge=0)
 
+# Properties to receive via API on partial update: omitted fields are left
+# unchanged, and required columns can't be cleared
+class ProductPatch(ProductUpdate):
+    @validator("name", "price", "stock", pre=True)
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
 # Properties to return via API
 class ProductInDB(ProductBase):
     id: int
@@ -32,4 +42,31 @@ class ProductInDB(ProductBase):
 
 # Additional properties to return via API
 class Product(ProductInDB):
-    pass 
\ No newline at end of file
+    pass
+
+# Fields that can be requested with ?fields=
+PRODUCT_FIELDS = tuple(Product.__fields__)
+
+@lru_cache(maxsize=None)
+def product_fields_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Response model with only the given fields of Product. Models are built
+    once per distinct tuple of fields, so callers should pass fields in a
+    canonical order.
+    """
+    hints = get_type_hints(Product)
+    return create_model(
+        "Product_" + "_".join(fields),
+        **{name: (hints[name], Product.__fields__[name].field_info) for name in fields}
+    )
+
+# A product as it appears in the change feed; deleted products have deleted_at set
+class ProductChange(ProductInDB):
+    change_seq: int
+    deleted_at: Optional[datetime] = None
+
+# One page of the change feed
+class ProductChanges(BaseModel):
+    changes: List[ProductChange]
+    next_since: int
+    has_more: bool
\ No newline at end of file
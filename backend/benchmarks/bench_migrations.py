@@ -0,0 +1,112 @@
+"""
+Runtime of the Alembic migrations on a large products table, and how long
+they stall application writes. Each run seeds a fresh database at
+revision 0002 (the schema before the change feed), starts a writer
+thread updating random products, runs `alembic upgrade head` and reports
+the migration time and the writer's worst latencies. Run from the backend
+directory:
+
+    python -m benchmarks.bench_migrations [--url postgresql://...]
+
+Without --url a temporary SQLite database is used. SQLite has a single
+writer lock, so there the stall tracks the backfill batch size; on
+Postgres the batches only lock the rows they touch and the index builds
+run CONCURRENTLY. With --url the database is dropped back to empty
+before every run.
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, insert, pool, table, column, text, update
+
+from app import migrations
+from benchmarks.seed import product_rows
+
+products = table("products", *(column(name) for name in (
+    "id", "name", "description", "price", "stock", "image_url", "category"
+)))
+
+def alembic_config(connection) -> Config:
+    cfg = Config()
+    cfg.set_main_option("script_location", "alembic")
+    cfg.attributes["connection"] = connection
+    return cfg
+
+def seed(engine, count: int, batch_size: int = 5000):
+    """Create the schema at revision 0002 and insert `count` products."""
+    with engine.begin() as connection:
+        command.downgrade(alembic_config(connection), "base")
+        command.upgrade(alembic_config(connection), "0002")
+    rows = list(product_rows(count))
+    with engine.begin() as connection:
+        for start in range(0, len(rows), batch_size):
+            connection.execute(insert(products), rows[start:start + batch_size])
+
+def writer(engine, count: int, stop: threading.Event, latencies: list):
+    """Update random products until stopped, recording each write's latency (ms)."""
+    rng = random.Random(1)
+    with engine.connect() as connection:
+        while not stop.is_set():
+            start = time.perf_counter()
+            connection.execute(
+                update(products).where(products.c.id == rng.randint(1, count)).values(stock=rng.randint(0, 500))
+            )
+            connection.commit()
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+def run(url: str, count: int, batch_size: int, pause: float) -> tuple:
+    connect_args = {"check_same_thread": False, "timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args, poolclass=pool.NullPool)
+    seed(engine, count)
+
+    migrations.BACKFILL_BATCH_SIZE = batch_size
+    migrations.BACKFILL_PAUSE = pause
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=writer, args=(engine, count, stop, latencies))
+    thread.start()
+    time.sleep(0.2)
+
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        command.upgrade(alembic_config(connection), "head")
+        connection.commit()
+    elapsed = time.perf_counter() - start
+
+    time.sleep(0.2)
+    stop.set()
+    thread.join()
+    with engine.connect() as connection:
+        missing = connection.execute(text("SELECT count(*) FROM products WHERE change_seq IS NULL")).scalar()
+    engine.dispose()
+    latencies.sort()
+    return elapsed, latencies, missing
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="database URL (default: temporary SQLite file per run)")
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1000, 5000, 20000, 0],
+                        help="backfill batch sizes; 0 backfills every row in one statement")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    print(f"{args.products} products, pause {args.pause}s")
+    print(f"{'batch':>8} {'upgrade s':>10} {'writes':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, batch_size in enumerate(args.batch_sizes):
+            url = args.url or f"sqlite:///{tmp}/bench{i}.db"
+            elapsed, latencies, missing = run(url, args.products, batch_size or args.products, args.pause)
+            assert missing == 0, f"{missing} rows were not backfilled"
+            print(f"{batch_size or 'all':>8} {elapsed:>10.2f} {len(latencies):>7} "
+                  f"{latencies[len(latencies) // 2]:>8.1f} {latencies[int(len(latencies) * 0.99)]:>8.1f} "
+                  f"{latencies[-1]:>8.1f}")
+
+if __name__ == "__main__":
+    main()
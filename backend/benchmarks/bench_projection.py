@@ -0,0 +1,64 @@
+"""
+Payload size and latency of GET /api/products/ with and without a
+sparse fieldset (?fields=). Run from the backend directory:
+
+    python -m benchmarks.bench_projection [--description-words 200]
+
+Requests go through the full app in process (TestClient) against a
+temporary SQLite database, so latency covers the query, building the
+response models and JSON encoding.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+CASES = [
+    ("all fields", ""),
+    ("grid", "&fields=name,price,image_url,stock"),
+    ("names", "&fields=name"),
+]
+
+def measure(client, url: str, requests: int) -> tuple:
+    """Latencies (ms) and the payload size of one response."""
+    size = len(client.get(url).content)
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    latencies.sort()
+    return latencies, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--description-words", type=int, default=60)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # main.py binds its engine at import, so point it at the scratch database first
+        os.environ["SQLITE_DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+        from fastapi.testclient import TestClient
+        from benchmarks.seed import make_engine, seed_products
+        from main import app
+
+        engine = make_engine(os.environ["SQLITE_DATABASE_URL"])
+        seed_products(engine, args.products, description_words=args.description_words)
+        client = TestClient(app)
+
+        print(f"{args.products} products, limit {args.limit}, {args.description_words}-word descriptions")
+        print(f"{'case':<12} {'bytes':>9} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, query in CASES:
+            url = f"/api/products/?limit={args.limit}{query}"
+            latencies, size = measure(client, url, args.requests)
+            print(f"{name:<12} {size:>9} {statistics.mean(latencies):>8.2f} "
+                  f"{latencies[len(latencies) // 2]:>8.2f} {latencies[int(len(latencies) * 0.99)]:>8.2f}")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
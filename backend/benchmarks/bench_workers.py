@@ -0,0 +1,112 @@
+"""
+Throughput of the production server (gunicorn_conf.py) as the worker
+count grows. Run from the backend directory:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 8
+
+Each run seeds a temporary SQLite database, starts gunicorn against it,
+warms up every worker, drives GET /api/products/ from several client
+processes over keep-alive connections and then stops the server with
+SIGTERM.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.seed import make_engine, seed_products
+
+PATH = "/api/products/?limit=20"
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start on port {port}")
+
+def client(port: int, duration: float, results):
+    """Issue requests back to back on one connection; report count and latencies."""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        conn.request("GET", PATH)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    results.put(latencies)
+
+def drive(port: int, clients: int, duration: float) -> list:
+    """Run `clients` client processes at once; returns all their latencies."""
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client, args=(port, duration, results))
+             for _ in range(clients)]
+    for proc in procs:
+        proc.start()
+    latencies = []
+    for _ in procs:
+        latencies.extend(results.get())
+    for proc in procs:
+        proc.join()
+    return latencies
+
+def run(workers: int, port: int, clients: int, duration: float, db_url: str):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}",
+               DB_TYPE="sqlite", SQLITE_DATABASE_URL=db_url)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "main:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        # Warm up every worker: each keep-alive connection sticks to the
+        # worker that accepted it, so open at least as many as there are
+        # workers, at once
+        drive(port, max(clients, workers), 2.0)
+        latencies = drive(port, clients, duration)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    return len(latencies) / duration, p50, p99
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{tmp}/bench.db"
+        seed_products(make_engine(db_url), args.products)
+
+        print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.duration:.0f}s per run")
+        print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'speedup':>8}")
+        baseline = None
+        for workers in args.workers:
+            rps, p50, p99 = run(workers, args.port, args.clients, args.duration, db_url)
+            baseline = baseline or rps
+            print(f"{workers:>8} {rps:>10.0f} {p50:>8.1f} {p99:>8.1f} {rps / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Latency of the product write paths: the previous ORM pattern (SELECT,
+setattr, COMMIT, refresh) against the single-statement
+INSERT/UPDATE/DELETE ... RETURNING used by the routes. Run from the
+backend directory:
+
+    python -m benchmarks.bench_writes [--url postgresql://...]
+
+Without --url a temporary SQLite database is used. Round trips cost more
+over a network, so Postgres shows the larger difference.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import delete, event, insert, update
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Product
+from benchmarks.seed import make_engine, product_rows, seed_products
+
+products_table = Product.__table__
+
+def orm_create(db, data):
+    product = Product(**data)
+    db.add(product)
+    db.commit()
+    db.refresh(product)
+    return product
+
+def returning_create(db, data):
+    product = db.execute(insert(products_table).values(**data).returning(products_table)).one()
+    db.commit()
+    return product
+
+def orm_update(db, product_id, data):
+    product = db.query(Product).filter(Product.id == product_id).first()
+    for field, value in data.items():
+        setattr(product, field, value)
+    db.add(product)
+    db.commit()
+    db.refresh(product)
+    return product
+
+def returning_update(db, product_id, data):
+    product = db.execute(
+        update(products_table).where(products_table.c.id == product_id)
+        .values(**data).returning(products_table)
+    ).first()
+    db.commit()
+    return product
+
+def orm_delete(db, product_id):
+    product = db.query(Product).filter(Product.id == product_id).first()
+    db.delete(product)
+    db.commit()
+    return product
+
+def returning_delete(db, product_id):
+    product = db.execute(
+        delete(products_table).where(products_table.c.id == product_id).returning(products_table)
+    ).first()
+    db.commit()
+    return product
+
+def measure(session_factory, counter, func, args_list):
+    """Run func once per args in a fresh session; return latencies (ms) and statements per call."""
+    latencies = []
+    counter[0] = 0
+    for args in args_list:
+        db = session_factory()
+        start = time.perf_counter()
+        func(db, *args)
+        latencies.append((time.perf_counter() - start) * 1000)
+        db.close()
+    return latencies, counter[0] / len(args_list)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="database URL (default: temporary SQLite file)")
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(args.url or f"sqlite:///{tmp}/bench.db")
+        seed_products(engine, args.products)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        counter = [0]
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count(*_):
+            counter[0] += 1
+
+        new_rows = list(product_rows(args.ops, seed=1))
+        ids = range(1, args.ops + 1)
+        cases = [
+            ("create", orm_create, returning_create, [(row,) for row in new_rows]),
+            ("update", orm_update, returning_update, [(i, {"price": 9.99, "stock": 3}) for i in ids]),
+            ("delete", orm_delete, returning_delete, [(i,) for i in ids]),
+        ]
+
+        print(f"{args.ops} ops each on {engine.dialect.name}, {args.products} products")
+        print(f"{'op':<8} {'path':<10} {'stmts':>6} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, orm_func, returning_func, call_args in cases:
+            # Alternate halves so both paths see a similar table
+            half = len(call_args) // 2
+            for label, func, batch in (("orm", orm_func, call_args[:half]),
+                                       ("returning", returning_func, call_args[half:])):
+                latencies, stmts = measure(session_factory, counter, func, batch)
+                latencies.sort()
+                print(f"{name:<8} {label:<10} {stmts:>6.1f} {statistics.mean(latencies):>8.3f} "
+                      f"{latencies[len(latencies) // 2]:>8.3f} {latencies[int(len(latencies) * 0.99)]:>8.3f}")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
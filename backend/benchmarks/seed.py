@@ -0,0 +1,43 @@
+"""
+Helpers for building throwaway databases for the benchmarks.
+"""
+import random
+
+from sqlalchemy import create_engine
+
+from app.db import Base
+from app.models import Product
+
+CATEGORIES = ["Phone Cases", "Laptop Sleeves", "Tablet Covers", "Watch Bands", "Earbud Cases"]
+WORDS = (
+    "slim rugged clear leather silicone magnetic wallet folio glitter matte "
+    "shockproof carbon marble floral vintage kickstand waterproof bamboo"
+).split()
+
+def make_engine(url: str):
+    """Create an engine and the full schema for the given database URL."""
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+def product_rows(count: int, description_words: int = 60, seed: int = 0):
+    """Yield random product rows as dicts."""
+    rng = random.Random(seed)
+    for i in range(count):
+        name = " ".join(rng.sample(WORDS, 3)).title()
+        yield {
+            "name": f"{name} {i}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(description_words)),
+            "price": round(rng.uniform(5, 120), 2),
+            "stock": rng.randint(0, 500),
+            "image_url": f"/images/products/{i}.jpg",
+            "category": rng.choice(CATEGORIES),
+        }
+
+def seed_products(engine, count: int, batch_size: int = 5000, **kwargs):
+    """Bulk insert `count` random products."""
+    rows = list(product_rows(count, **kwargs))
+    with engine.begin() as conn:
+        for start in range(0, count, batch_size):
+            conn.execute(Product.__table__.insert(), rows[start:start + batch_size])
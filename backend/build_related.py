@@ -0,0 +1,26 @@
+import time
+
+from app.db import SessionLocal, engine, Base
+from app.models import RelatedProduct
+from app.related import rebuild_related
+
+# Create tables if they don't exist
+Base.metadata.create_all(bind=engine)
+
+def build_related_products():
+    """
+    Recompute related products for the whole catalog. Product writes keep
+    the table roughly up to date; run this periodically (e.g. nightly) to
+    pick up everything incremental updates approximate.
+    """
+    db = SessionLocal()
+    
+    try:
+        start = time.perf_counter()
+        rows = rebuild_related(db)
+        print(f"Wrote {rows} related product rows in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    build_related_products()
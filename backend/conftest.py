@@ -0,0 +1,63 @@
+"""
+Shared test setup: a scratch database for every test that needs one.
+
+app.db creates its engine when first imported, and importing main runs
+check_schema and create_all against it. The environment is pointed at a
+throwaway SQLite file here, before any test module is collected, so a
+test run never touches the development test.db.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+os.environ["DB_TYPE"] = "sqlite"
+os.environ["SQLITE_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/app.db"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from app.db import Base, get_db
+
+@contextmanager
+def serve_database(engine):
+    """Route the get_db dependency to `engine` inside the block; yields the session factory."""
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield session_factory
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+@pytest.fixture(scope="session")
+def database_override():
+    """serve_database, for fixtures of any scope."""
+    return serve_database
+
+@pytest.fixture
+def engine(tmp_path):
+    """Empty SQLite database with every table."""
+    engine = create_engine(f"sqlite:///{tmp_path}/scratch.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    """Sessions on the scratch database, which get_db also hands to routes."""
+    with serve_database(engine) as session_factory:
+        yield session_factory
+
+@pytest.fixture
+def client(session_factory):
+    return TestClient(app)
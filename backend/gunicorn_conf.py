@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for running the API in production:
+
+    gunicorn -c gunicorn_conf.py main:app
+
+Every setting can be overridden through the environment.
+"""
+import gc
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Import the app once in the master so workers share it copy-on-write
+preload_app = True
+
+# Seconds to hold idle keep-alive connections open
+keepalive = int(os.getenv("KEEP_ALIVE", "5"))
+
+# Recycle each worker after this many requests (plus jitter, so they don't
+# all restart together) to bound memory growth
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
+# On SIGTERM workers stop accepting connections and get this long to
+# finish in-flight requests before being killed
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before any fork."""
+    from app.auth.jwt import pwd_context
+    from app.db import engine
+
+    # Load the bcrypt backend here rather than on each worker's first login
+    pwd_context.dummy_verify()
+
+    # create_all ran at import; don't let workers inherit those connections
+    engine.dispose()
+
+    # Keep the garbage collector from touching (and so copying) the
+    # objects created during preload
+    gc.freeze()
+
+def post_fork(server, worker):
+    """Runs in each worker right after fork."""
+    from app.db import engine
+
+    # Each worker must open its own database connections
+    engine.dispose()
@@ -1,21 +1,32 @@
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
 # Import database and models
-from app.db import engine, Base
-from app.models import User, Product
+from app.db import engine, Base, check_schema
+from app.models import User, Product, RevokedToken, ChangeSequence, RelatedProduct, AuditEvent
 
 # Import routes
-from app.routes import products, auth
+from app.routes import products, auth, audit
+from app.auth.revocation import revocation_list
+from app.audit import audit_buffer
+from app.admission import AdmissionControl
 
 # Load environment variables
 load_dotenv()
 
-# Create tables
+# Refuse to start on a database that needs migrating, then create any
+# missing tables
+check_schema(engine, Base.metadata)
 Base.metadata.create_all(bind=engine)
 
+# Threads per worker process for sync routes (each can hold a DB connection)
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Casecraft API",
@@ -23,6 +34,10 @@ app = FastAPI(
     version="0.1.0"
 )
 
+# Shed load per route class before requests queue for a thread
+# (added first so CORS headers still go on 503 responses)
+app.add_middleware(AdmissionControl, capacity=THREADPOOL_SIZE)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -35,12 +50,40 @@ app.add_middleware(
 # Include routers
 app.include_router(products.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
+app.include_router(audit.router, prefix="/api")
+
+@app.on_event("startup")
+async def configure_threadpool():
+    # Starlette runs sync routes in the event loop's default executor
+    asyncio.get_event_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREADPOOL_SIZE)
+    )
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    # Keep the in-memory token revocation list in step with the database
+    app.state.revocation_sync = asyncio.create_task(revocation_list.run())
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    app.state.revocation_sync.cancel()
+
+@app.on_event("startup")
+async def start_audit_flush():
+    # Write buffered audit events to the database in batches
+    app.state.audit_flush = asyncio.create_task(audit_buffer.run())
+
+@app.on_event("shutdown")
+async def stop_audit_flush():
+    app.state.audit_flush.cancel()
+    # Write whatever is still buffered before the worker exits
+    await run_in_threadpool(audit_buffer.flush)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Casecraft API"}
 
-# Run the application
+# Run the development server (see gunicorn_conf.py for production)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
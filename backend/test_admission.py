@@ -0,0 +1,166 @@
+"""
+Admission control under overload.
+
+The tests drive a stand-in ASGI app shaped like the real one: every
+request needs one of THREADS threads (a semaphore, like Starlette's
+threadpool), browse requests hold it for BROWSE_SECONDS and auth requests
+for AUTH_SECONDS, like a bcrypt login. Logins arrive far faster than they
+can be served while catalog reads arrive at a steady rate.
+
+    pytest test_admission.py
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.admission import PASSWORD_PATHS, AdmissionControl, classify, load_config
+
+THREADS = 8
+BROWSE_SECONDS = 0.002
+AUTH_SECONDS = 0.05
+
+def make_app():
+    threads = asyncio.Semaphore(THREADS)
+
+    async def app(scope, receive, send):
+        async with threads:
+            slow = scope["path"] in PASSWORD_PATHS
+            await asyncio.sleep(AUTH_SECONDS if slow else BROWSE_SECONDS)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return app
+
+async def call(app, method: str, path: str) -> tuple:
+    """Send one request; returns (status, headers, latency in seconds)."""
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+    response = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    return response["status"], response["headers"], time.perf_counter() - start
+
+async def overload(app, duration: float = 1.0) -> dict:
+    """500 logins/s against ~160/s of capacity, plus 200 catalog reads/s."""
+    tasks = {"browse": [], "auth": []}
+    start = time.perf_counter()
+    tick = 0
+    while time.perf_counter() - start < duration:
+        tasks["auth"].append(asyncio.ensure_future(call(app, "POST", "/api/auth/token")))
+        if tick % 5 == 0:
+            tasks["browse"].append(asyncio.ensure_future(call(app, "GET", "/api/products/")))
+        tick += 1
+        await asyncio.sleep(0.002)
+    return {name: await asyncio.gather(*futures) for name, futures in tasks.items()}
+
+def p99(results) -> float:
+    latencies = sorted(latency for status, _, latency in results if status == 200)
+    return latencies[int(len(latencies) * 0.99)]
+
+def admission(app, **overrides):
+    config = load_config(json.dumps({"target_ms": 20, "interval_ms": 100, **overrides}))
+    return AdmissionControl(app, capacity=THREADS, config=config)
+
+def test_browse_p99_stays_bounded_while_auth_saturates():
+    baseline = asyncio.run(overload(make_app()))
+    results = asyncio.run(overload(admission(make_app())))
+
+    browse, auth = results["browse"], results["auth"]
+    assert all(status == 200 for status, _, _ in browse)
+    assert p99(browse) < 0.05, f"browse p99 {p99(browse) * 1000:.0f}ms"
+    # Without admission control reads wait behind the login backlog
+    assert p99(baseline["browse"]) > 10 * p99(browse)
+
+    shed = [(headers, latency) for status, headers, latency in auth if status == 503]
+    assert shed and len(shed) < len(auth)
+    assert all(headers[b"retry-after"] == b"1" for headers, _ in shed)
+    # Once overloaded, logins are turned away within the target delay rather than after max_wait
+    assert sorted(latency for _, latency in shed)[len(shed) // 2] < 0.1
+
+def test_full_queue_sheds_immediately():
+    async def scenario():
+        middleware = admission(make_app(), classes={"auth": {"limit": 1, "queue": 1}})
+        running = asyncio.ensure_future(call(middleware, "POST", "/api/auth/token"))
+        queued = asyncio.ensure_future(call(middleware, "POST", "/api/auth/token"))
+        await asyncio.sleep(0)
+        rejected = await call(middleware, "POST", "/api/auth/token")
+        stats = middleware.controller.stats()["auth"]
+        return await running, await queued, rejected, stats
+
+    running, queued, rejected, stats = asyncio.run(scenario())
+    assert running[0] == queued[0] == 200
+    assert rejected[0] == 503 and rejected[2] < AUTH_SECONDS
+    assert stats["shed"]["queue_full"] == 1
+
+def test_reserved_share_admits_browse_when_shared_capacity_is_taken():
+    async def scenario():
+        # Admin writes may take all shared capacity, but not browse's reserved half
+        middleware = admission(make_app(), classes={"admin_write": {"limit": 1.0}})
+        controller = middleware.controller
+        for _ in range(THREADS // 2):
+            await controller.acquire("admin_write")
+        return await call(middleware, "GET", "/api/products/")
+
+    status, _, latency = asyncio.run(scenario())
+    assert status == 200 and latency < 0.02
+
+def test_classify():
+    assert classify("POST", "/api/auth/token") == "auth"
+    assert classify("POST", "/api/auth/register") == "auth"
+    # Token checks without a password hash stay with the cheap reads
+    assert classify("POST", "/api/auth/refresh") == "browse"
+    assert classify("GET", "/api/auth/me") == "browse"
+    assert classify("POST", "/api/auth/logout") == "browse"
+    assert classify("PATCH", "/api/products/1") == "admin_write"
+    assert classify("GET", "/api/products/1") == "browse"
+
+def test_refresh_is_admitted_during_a_login_flood():
+    async def scenario():
+        middleware = admission(make_app(), classes={"auth": {"limit": 1, "queue": 1}})
+        logins = [asyncio.ensure_future(call(middleware, "POST", "/api/auth/token")) for _ in range(5)]
+        await asyncio.sleep(0)
+        refresh = await call(middleware, "POST", "/api/auth/refresh")
+        return refresh, await asyncio.gather(*logins)
+
+    refresh, logins = asyncio.run(scenario())
+    assert any(status == 503 for status, _, _ in logins)
+    assert refresh[0] == 200 and refresh[2] < AUTH_SECONDS
+
+def test_config():
+    config = load_config('{"capacity": 100, "classes": {"browse": {"reserved": 0.6}}}')
+    assert config["classes"]["browse"]["reserved"] == 0.6
+    assert config["classes"]["auth"] == load_config()["classes"]["auth"]
+    # Never more requests in flight than there are threads
+    assert AdmissionControl(make_app(), capacity=THREADS, config=config).controller.capacity == THREADS
+    with pytest.raises(ValueError):
+        load_config('{"classes": {"checkout": {}}}')
+
+def test_overload_ends_once_the_queue_drains():
+    async def scenario():
+        middleware = admission(make_app(), classes={"auth": {"limit": 1}})
+        burst = []
+        for _ in range(30):
+            burst.append(asyncio.ensure_future(call(middleware, "POST", "/api/auth/token")))
+            await asyncio.sleep(0.01)
+        burst = await asyncio.gather(*burst)
+        await asyncio.sleep(0.2)
+        # One login runs, the next waits for it longer than the target but well under max_wait
+        running = asyncio.ensure_future(call(middleware, "POST", "/api/auth/token"))
+        await asyncio.sleep(0)
+        queued = await call(middleware, "POST", "/api/auth/token")
+        return burst, await running, queued
+
+    burst, running, queued = asyncio.run(scenario())
+    assert any(status == 503 for status, _, _ in burst)
+    assert running[0] == 200
+    assert queued[0] == 200 and queued[2] > AUTH_SECONDS
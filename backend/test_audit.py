@@ -0,0 +1,161 @@
+"""
+Write-behind audit buffer: batching, overflow and flush triggers, the
+events routes record and the admin-only audit routes.
+
+    pytest test_audit.py
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.audit import AuditBuffer
+from app.auth.jwt import create_access_token, get_password_hash
+from app.models import AuditEvent, User
+from app.routes import audit as audit_routes, auth as auth_routes, products as products_routes
+
+def stored(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(AuditEvent.__table__)).scalar()
+
+def test_flush_writes_batched_inserts(engine):
+    inserts = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: inserts.append(statement) if statement.startswith("INSERT") else None)
+    buffer = AuditBuffer(capacity=100, batch_size=10, session_factory=sessionmaker(bind=engine))
+    for i in range(25):
+        buffer.record("product.patch", "admin", f"product:{i}", ip="10.0.0.1", details={"fields": ["stock"]})
+
+    assert buffer.flush() == 25
+    assert len(inserts) == 3
+    assert stored(engine) == 25
+    assert buffer.stats()["buffered"] == 0 and buffer.stats()["written"] == 25
+
+def test_overflow_drops_oldest_events(engine):
+    buffer = AuditBuffer(capacity=5, batch_size=5, session_factory=sessionmaker(bind=engine))
+    for i in range(8):
+        buffer.record("auth.login", f"user{i}", success=False)
+    buffer.flush()
+
+    with engine.connect() as conn:
+        actors = conn.execute(select(AuditEvent.actor).order_by(AuditEvent.id)).scalars().all()
+    assert actors == [f"user{i}" for i in range(3, 8)]
+    assert buffer.stats()["dropped"] == 3
+
+def test_failed_flush_keeps_events(engine):
+    buffer = AuditBuffer(capacity=10, batch_size=10, session_factory=sessionmaker(bind=engine))
+    buffer.record("auth.login", "user1")
+    AuditEvent.__table__.drop(engine)
+    with pytest.raises(Exception):
+        buffer.flush()
+    assert buffer.stats()["buffered"] == 1 and buffer.stats()["failed_batches"] == 1
+
+    AuditEvent.__table__.create(engine)
+    assert buffer.flush() == 1
+
+def test_full_batch_triggers_flush_before_interval(engine):
+    buffer = AuditBuffer(capacity=100, batch_size=10, session_factory=sessionmaker(bind=engine))
+
+    async def scenario():
+        task = asyncio.ensure_future(buffer.run(interval=60))
+        await asyncio.sleep(0.05)
+        for i in range(10):
+            buffer.record("product.create", "admin", f"product:{i}")
+        for _ in range(100):
+            if stored(engine) == 10:
+                break
+            await asyncio.sleep(0.02)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert stored(engine) == 10
+
+@pytest.fixture
+def audit(engine, session_factory, monkeypatch):
+    """A fresh buffer writing to the scratch database, used by every route."""
+    buffer = AuditBuffer(session_factory=session_factory)
+    for module in (audit_routes, auth_routes, products_routes):
+        monkeypatch.setattr(module, "audit_buffer", buffer)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"email": "admin@example.com", "username": "admin", "hashed_password": get_password_hash("secret"),
+             "is_active": True, "is_admin": True},
+            {"email": "bob@example.com", "username": "bob", "hashed_password": "-",
+             "is_active": True, "is_admin": False},
+        ])
+    return buffer
+
+def as_user(username: str) -> dict:
+    return {"Authorization": "Bearer " + create_access_token(data={"sub": username})}
+
+def events(client, **params) -> dict:
+    response = client.get("/api/audit/", params=params, headers=as_user("admin"))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_audit_routes_are_admin_only(client, audit):
+    for path in ("/api/audit/", "/api/audit/stats"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=as_user("bob")).status_code == 403
+        assert client.get(path, headers=as_user("admin")).status_code == 200
+
+def test_audit_events_page_newest_first_and_filter(client, engine, audit):
+    for i in range(7):
+        audit.record("auth.login", ["alice", "bob"][i % 2])
+    for i in range(3):
+        audit.record("product.create", "admin", f"product:{i}")
+    audit.flush()
+    with engine.connect() as conn:
+        rows = conn.execute(select(AuditEvent.__table__).order_by(AuditEvent.id.desc())).all()
+
+    # Keyset pages cover every event once, newest first
+    pages, before = [], None
+    while True:
+        page = events(client, limit=4, **({"before": before} if before else {}))
+        pages.append([event["id"] for event in page["events"]])
+        if not page["has_more"]:
+            assert page["next_before"] is None
+            break
+        before = page["next_before"]
+        assert before == pages[-1][-1]
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert sum(pages, []) == [row.id for row in rows]
+
+    logins = events(client, action="auth.login", actor="bob")
+    assert [event["id"] for event in logins["events"]] == [
+        row.id for row in rows if row.action == "auth.login" and row.actor == "bob"
+    ]
+    first = events(client, action="auth.login", limit=2)
+    rest = events(client, action="auth.login", before=first["next_before"])
+    assert len(first["events"]) + len(rest["events"]) == 7 and not rest["has_more"]
+    assert all(event["action"] == "auth.login" for event in first["events"] + rest["events"])
+
+def test_routes_record_audit_events(client, audit):
+    assert client.post("/api/auth/token", data={"username": "admin", "password": "wrong"}).status_code == 401
+    assert client.post("/api/auth/token", data={"username": "admin", "password": "secret"}).status_code == 200
+
+    headers = as_user("admin")
+    product = client.post("/api/products/", headers=headers, json={"name": "Case", "price": 10, "stock": 1}).json()
+    target = f"product:{product['id']}"
+    assert client.put(f"/api/products/{product['id']}", headers=headers,
+                      json={"name": "Case", "price": 12, "stock": 1}).status_code == 200
+    assert client.patch(f"/api/products/{product['id']}", headers=headers, json={"stock": 3}).status_code == 200
+    assert client.delete(f"/api/products/{product['id']}", headers=headers).status_code == 200
+    # Only written once flushed
+    assert events(client)["events"] == []
+    audit.flush()
+
+    recorded = [
+        (event["action"], event["actor"], event["target"], event["success"], event["details"])
+        for event in reversed(events(client)["events"])
+    ]
+    assert recorded == [
+        ("auth.login", "admin", None, False, None),
+        ("auth.login", "admin", None, True, None),
+        ("product.create", "admin", target, True, None),
+        ("product.update", "admin", target, True, {"fields": ["name", "price", "stock"]}),
+        ("product.patch", "admin", target, True, {"fields": ["stock"]}),
+        ("product.delete", "admin", target, True, None),
+    ]
+    assert all(event["ip"] == "testclient" for event in events(client)["events"])
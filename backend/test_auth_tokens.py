@@ -0,0 +1,165 @@
+"""
+Refresh token rotation, logout and the in-memory revocation list.
+
+    pytest test_auth_tokens.py
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.auth import revocation
+from app.auth.jwt import create_access_token, create_refresh_token, get_password_hash
+from app.auth.revocation import BloomFilter, RevocationList, REVOCATION_FULL_SYNC_EVERY
+from app.models import RevokedToken, User
+
+@pytest.fixture(autouse=True)
+def revocation_sessions(session_factory, monkeypatch):
+    # RevocationList.sync reads the scratch database too
+    monkeypatch.setattr(revocation, "SessionLocal", session_factory)
+
+@pytest.fixture
+def client(client, session_factory):
+    with session_factory() as db:
+        db.add(User(email="alice@example.com", username="alice",
+                    hashed_password=get_password_hash("secret"), is_active=True))
+        db.commit()
+    return client
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+def revoked_row(jti: str, expires_at: datetime) -> RevokedToken:
+    return RevokedToken(jti=jti, token_type="access", expires_at=expires_at)
+
+def test_refresh_token_is_single_use(client):
+    refresh_token = create_refresh_token(data={"sub": "alice"})
+
+    response = client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    tokens = response.json()
+    assert tokens["refresh_token"] != refresh_token
+    assert client.get("/api/auth/me", headers=bearer(tokens["access_token"])).status_code == 200
+
+    assert client.post("/api/auth/refresh", json={"refresh_token": refresh_token}).status_code == 401
+    # The rotated token still works once
+    assert client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+
+def test_access_token_is_refused_for_refresh(client):
+    access_token = create_access_token(data={"sub": "alice"})
+    assert client.post("/api/auth/refresh", json={"refresh_token": access_token}).status_code == 401
+
+def test_refresh_token_is_refused_as_access_token(client):
+    refresh_token = create_refresh_token(data={"sub": "alice"})
+    assert client.get("/api/auth/me", headers=bearer(refresh_token)).status_code == 401
+
+def test_logout_revokes_access_and_refresh_tokens(client):
+    access_token = create_access_token(data={"sub": "alice"})
+    refresh_token = create_refresh_token(data={"sub": "alice"})
+    assert client.get("/api/auth/me", headers=bearer(access_token)).status_code == 200
+
+    response = client.post("/api/auth/logout", headers=bearer(access_token),
+                           json={"refresh_token": refresh_token})
+    assert response.status_code == 204
+    assert client.get("/api/auth/me", headers=bearer(access_token)).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": refresh_token}).status_code == 401
+
+def test_logout_refuses_another_users_refresh_token(client):
+    access_token = create_access_token(data={"sub": "alice"})
+    refresh_token = create_refresh_token(data={"sub": "bob"})
+    response = client.post("/api/auth/logout", headers=bearer(access_token),
+                           json={"refresh_token": refresh_token})
+    assert response.status_code == 400
+    # Nothing was revoked
+    assert client.get("/api/auth/me", headers=bearer(access_token)).status_code == 200
+
+def login(client) -> dict:
+    response = client.post("/api/auth/token", data={"username": "alice", "password": "secret"})
+    assert response.status_code == 200
+    return response.json()
+
+def test_logout_with_a_bad_refresh_token_revokes_nothing(client):
+    tokens = login(client)
+    response = client.post("/api/auth/logout", headers=bearer(tokens["access_token"]),
+                           json={"refresh_token": "not-a-token"})
+    assert response.status_code == 401
+
+    assert client.get("/api/auth/me", headers=bearer(tokens["access_token"])).status_code == 200
+    assert client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+
+def test_logout_without_a_body_ends_the_session(client):
+    tokens = login(client)
+    # The rotated pair belongs to the same session
+    tokens = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    assert client.post("/api/auth/logout", headers=bearer(tokens["access_token"])).status_code == 204
+    assert client.get("/api/auth/me", headers=bearer(tokens["access_token"])).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000)
+    keys = [f"jti-{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 50
+
+def test_add_rebuilds_filter_on_overflow():
+    revoked = RevocationList(capacity=64)
+    future = datetime.utcnow() + timedelta(hours=1)
+    revoked.add("expired", datetime.utcnow() - timedelta(seconds=1))
+    for i in range(200):
+        revoked.add(f"jti-{i}", future)
+
+    bloom, entries = revoked._state
+    assert bloom.capacity >= 200
+    assert all(revoked.is_revoked(f"jti-{i}") for i in range(200))
+    # Rebuilding drops entries whose tokens have expired anyway
+    assert "expired" not in entries
+    assert not revoked.is_revoked("never-revoked")
+
+def test_sync_is_incremental_between_full_reloads(session_factory):
+    now = datetime.utcnow()
+    with session_factory() as db:
+        db.add_all([revoked_row("live-1", now + timedelta(hours=1)), revoked_row("old", now - timedelta(hours=1))])
+        db.commit()
+
+    revoked = RevocationList()
+    # The first sync is a full reload, which purges expired rows
+    revoked.sync()
+    assert revoked.is_revoked("live-1")
+    assert not revoked.is_revoked("old")
+    with session_factory() as db:
+        assert db.execute(select(func.count()).select_from(RevokedToken)).scalar() == 1
+
+    # Incremental syncs pick up rows by id, revoked by other processes
+    with session_factory() as db:
+        db.add(revoked_row("live-2", now + timedelta(hours=1)))
+        db.commit()
+    revoked.sync()
+    assert revoked.is_revoked("live-2")
+
+    # A row with a lower id than the last one seen (a late commit) is only
+    # found by the next full reload
+    with session_factory() as db:
+        db.add(RevokedToken(id=1000, jti="late-high", token_type="access", expires_at=now + timedelta(hours=1)))
+        db.add(RevokedToken(id=500, jti="late-low", token_type="access", expires_at=now + timedelta(hours=1)))
+        db.commit()
+    revoked.sync()
+    assert revoked.is_revoked("late-high") and revoked.is_revoked("late-low")
+    with session_factory() as db:
+        db.add(RevokedToken(id=900, jti="skipped", token_type="access", expires_at=now + timedelta(hours=1)))
+        db.commit()
+    while revoked._syncs % REVOCATION_FULL_SYNC_EVERY != 0:
+        revoked.sync()
+        assert not revoked.is_revoked("skipped")
+    revoked.sync()
+    assert revoked.is_revoked("skipped")
+
+def test_local_revocations_survive_a_full_sync(session_factory):
+    revoked = RevocationList()
+    # Revoked here but not (yet) visible in the database
+    revoked.add("local", datetime.utcnow() + timedelta(hours=1))
+    revoked.sync()
+    assert revoked.is_revoked("local")
@@ -0,0 +1,150 @@
+"""
+Behaviour of the product routes against a scratch database.
+
+    pytest test_products.py
+"""
+import pytest
+from sqlalchemy import create_engine, event, select, text
+
+from app.auth.jwt import create_access_token
+from app.db import Base, check_schema
+from app.models import Product, User
+
+@pytest.fixture
+def client(client, engine):
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {
+            "email": "admin@example.com", "username": "admin", "hashed_password": "-",
+            "is_active": True, "is_admin": True,
+        })
+    client.headers["Authorization"] = "Bearer " + create_access_token(data={"sub": "admin"})
+    return client
+
+def create(client, **fields) -> dict:
+    data = {"name": "Slim Case", "description": "Matte finish", "price": 19.5, "stock": 4,
+            "image_url": "/images/slim.jpg", "category": "Phone Cases", **fields}
+    response = client.post("/api/products/", json=data)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def stored(engine, product_id: int):
+    with engine.connect() as conn:
+        return conn.execute(select(Product.__table__).where(Product.id == product_id)).one()
+
+@pytest.mark.parametrize("field", ["name", "price", "stock"])
+def test_patch_rejects_null_for_required_columns(client, engine, field):
+    product = create(client)
+    response = client.patch(f"/api/products/{product['id']}", json={field: None})
+    assert response.status_code == 422
+    assert getattr(stored(engine, product["id"]), field) == product[field]
+
+def test_patch_changes_only_the_fields_sent(client, engine):
+    product = create(client)
+    before = stored(engine, product["id"])
+
+    response = client.patch(f"/api/products/{product['id']}", json={"stock": 9, "description": None})
+    assert response.status_code == 200, response.text
+    assert response.json()["stock"] == 9
+
+    after = stored(engine, product["id"])
+    assert after.stock == 9 and after.description is None
+    for column in ("name", "price", "image_url", "category"):
+        assert getattr(after, column) == getattr(before, column)
+    assert after.change_seq > before.change_seq
+
+def test_patch_unknown_product_is_404(client):
+    assert client.patch("/api/products/999", json={"stock": 1}).status_code == 404
+
+def changes(client, since: int, limit: int = 100) -> dict:
+    response = client.get(f"/api/products/changes?since={since}&limit={limit}")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_change_feed_pages_in_change_order(client):
+    ids = [create(client, name=f"Case {i}")["id"] for i in range(3)]
+
+    first = changes(client, 0, limit=2)
+    assert [change["id"] for change in first["changes"]] == ids[:2]
+    assert first["has_more"] is True
+    assert first["next_since"] == first["changes"][-1]["change_seq"]
+
+    second = changes(client, first["next_since"], limit=2)
+    assert [change["id"] for change in second["changes"]] == ids[2:]
+    assert second["has_more"] is False
+
+    # Nothing new: next_since stays put
+    empty = changes(client, second["next_since"])
+    assert empty == {"changes": [], "next_since": second["next_since"], "has_more": False}
+
+def test_change_feed_reports_updates_and_soft_deletes(client):
+    ids = [create(client, name=f"Case {i}")["id"] for i in range(3)]
+    since = changes(client, 0)["next_since"]
+
+    assert client.patch(f"/api/products/{ids[0]}", json={"price": 25}).status_code == 200
+    assert client.delete(f"/api/products/{ids[1]}").status_code == 200
+
+    feed = changes(client, since)
+    assert [change["id"] for change in feed["changes"]] == [ids[0], ids[1]]
+    updated, deleted = feed["changes"]
+    assert updated["price"] == 25 and updated["deleted_at"] is None
+    assert deleted["deleted_at"] is not None
+    assert updated["change_seq"] > since and deleted["change_seq"] > updated["change_seq"]
+
+    # The tombstone is gone from the catalog and can't be changed again
+    assert client.get(f"/api/products/{ids[1]}").status_code == 404
+    assert ids[1] not in [product["id"] for product in client.get("/api/products/").json()]
+    assert client.delete(f"/api/products/{ids[1]}").status_code == 404
+
+def product_selects(engine) -> list:
+    """Record the SELECTs sent to the products table."""
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement)
+                 if statement.startswith("SELECT") and "FROM products" in statement else None)
+    return statements
+
+def selected_columns(statement: str) -> set:
+    columns = statement.split("SELECT", 1)[1].split("FROM", 1)[0]
+    return {column.strip().rsplit(".", 1)[-1] for column in columns.split(",")}
+
+@pytest.mark.parametrize("path", ["/api/products/?fields={}", "/api/products/{id}?fields={}"])
+def test_fields_projects_the_query_and_the_payload(client, engine, path):
+    product = create(client)
+    statements = product_selects(engine)
+
+    response = client.get(path.format("description", id=product["id"]))
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body[0] if isinstance(body, list) else body) == {"id": product["id"], "description": "Matte finish"}
+    assert [selected_columns(statement) for statement in statements] == [{"id", "description"}]
+
+def test_fields_always_include_id_in_schema_order(client):
+    product = create(client)
+    response = client.get(f"/api/products/{product['id']}?fields=price, name,id,name")
+    assert response.status_code == 200
+    assert list(response.json()) == ["id", "name", "price"]
+
+@pytest.mark.parametrize("path", ["/api/products/", "/api/products/1"])
+def test_fields_rejects_unknown_fields(client, path):
+    create(client)
+    response = client.get(f"{path}?fields=name,hashed_password,cost")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: cost, hashed_password"
+
+def test_related_is_404_for_unknown_and_deleted_products(client):
+    kept, deleted = create(client)["id"], create(client)["id"]
+    assert client.delete(f"/api/products/{deleted}").status_code == 200
+
+    assert client.get(f"/api/products/{kept}/related").status_code == 200
+    assert client.get(f"/api/products/{deleted}/related").status_code == 404
+    assert client.get("/api/products/999/related").status_code == 404
+
+def test_check_schema_refuses_a_database_that_needs_migrating(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE products (id INTEGER PRIMARY KEY, name VARCHAR(100))"))
+    with pytest.raises(RuntimeError, match=r"alembic stamp 0001 && alembic upgrade head"):
+        check_schema(engine, Base.metadata)
+
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{tmp_path}/new.db"))
+    check_schema(create_engine(f"sqlite:///{tmp_path}/new.db"), Base.metadata)
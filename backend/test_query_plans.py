@@ -0,0 +1,381 @@
+"""
+Query plan regression tests.
+
+Every API route is called against a seeded database while the engine
+records each statement it emits. Each statement is then run through
+EXPLAIN QUERY PLAN (SQLite) and compared with the expected plan below, so
+a change that adds a query or turns an index lookup into a table scan
+fails with a diff. Set PLAN_TEST_POSTGRES_URL to also run the routes
+against Postgres, where EXPLAIN output is checked for sequential scans.
+
+    pytest test_query_plans.py
+"""
+import difflib
+from datetime import datetime, timedelta
+import itertools
+import os
+import re
+import textwrap
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, func, update
+from sqlalchemy.orm import Session
+
+from main import app
+from app.db import Base
+from app.models import User, Product, ChangeSequence, AuditEvent
+from app.auth.jwt import create_access_token, create_refresh_token, get_password_hash
+from app.related import refresh_related
+from app.routes import products as products_routes
+
+PRODUCT_COUNT = 20000
+USER_COUNT = 5000
+CATEGORY_COUNT = 60
+AUDIT_EVENT_COUNT = 20000
+PASSWORD = "plans-password"
+
+# (name, method, route path, url, body kind, tables that must not be scanned,
+#  expected SQLite plan)
+ROUTES = [
+    ("root", "GET", "/", "/", None, [], ""),
+    ("list products", "GET", "/api/products/", "/api/products/?limit=20", None, [], """
+        SELECT products
+          SCAN products
+    """),
+    ("list products, sparse fields", "GET", "/api/products/", "/api/products/?limit=20&fields=name,price,image_url,stock", None, [], """
+        SELECT products
+          SCAN products
+    """),
+    ("list products by category", "GET", "/api/products/", "/api/products/?category=category-7", None, ["products"], """
+        SELECT products
+          SEARCH products USING INDEX ix_products_category (category=?)
+    """),
+    ("product changes", "GET", "/api/products/changes", "/api/products/changes?since=19000", None, ["products"], """
+        SELECT products
+          SEARCH products USING INDEX ix_products_change_seq (change_seq>?)
+    """),
+    ("related products", "GET", "/api/products/{product_id}/related", "/api/products/42/related", None, ["products", "related_products"], """
+        SELECT products
+          SEARCH related_products USING INDEX sqlite_autoindex_related_products_1 (product_id=?)
+          SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+    """),
+    ("related products, none stored", "GET", "/api/products/{product_id}/related", "/api/products/43/related", None, ["products", "related_products"], """
+        SELECT products
+          SEARCH related_products USING INDEX sqlite_autoindex_related_products_1 (product_id=?)
+          SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+        SELECT products
+          SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+    """),
+    ("get product", "GET", "/api/products/{product_id}", "/api/products/42", None, ["products"], """
+        SELECT products
+          SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+    """),
+    ("get product, sparse fields", "GET", "/api/products/{product_id}", "/api/products/42?fields=name,price", None, ["products"], """
+        SELECT products
+          SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+    """),
+    ("create product", "POST", "/api/products/", "/api/products/", "product", ["users", "products"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        INSERT change_sequences
+        INSERT products
+    """),
+    ("update product", "PUT", "/api/products/{product_id}", "/api/products/43", "product", ["users", "products"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        INSERT change_sequences
+        UPDATE products
+          SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+    """),
+    ("patch product", "PATCH", "/api/products/{product_id}", "/api/products/45", "patch", ["users", "products"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        INSERT change_sequences
+        UPDATE products
+          SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+    """),
+    ("delete product", "DELETE", "/api/products/{product_id}", "/api/products/44", None, ["users", "products"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        INSERT change_sequences
+        UPDATE products
+          SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+    """),
+    ("register", "POST", "/api/auth/register", "/api/auth/register", "register", ["users"], """
+        SELECT users
+          MULTI-INDEX OR
+            INDEX 1
+              SEARCH users USING INDEX ix_users_email (email=?)
+            INDEX 2
+              SEARCH users USING INDEX ix_users_username (username=?)
+        INSERT users
+    """),
+    ("login", "POST", "/api/auth/token", "/api/auth/token", "login", ["users"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+    """),
+    ("login by email", "POST", "/api/auth/token", "/api/auth/token", "login_email", ["users"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        SELECT users
+          SEARCH users USING INDEX ix_users_email (email=?)
+    """),
+    ("refresh", "POST", "/api/auth/refresh", "/api/auth/refresh", "refresh", ["users"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        INSERT revoked_tokens
+    """),
+    ("logout", "POST", "/api/auth/logout", "/api/auth/logout", "refresh", [], """
+        INSERT revoked_tokens
+        INSERT revoked_tokens
+    """),
+    ("me", "GET", "/api/auth/me", "/api/auth/me", None, ["users"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+    """),
+    ("audit events", "GET", "/api/audit/", "/api/audit/?limit=50", None, ["users"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        SELECT audit_events
+          SCAN audit_events
+    """),
+    ("audit events, next page", "GET", "/api/audit/", "/api/audit/?before=15000&limit=50", None, ["users", "audit_events"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        SELECT audit_events
+          SEARCH audit_events USING INTEGER PRIMARY KEY (rowid<?)
+    """),
+    ("audit events by action", "GET", "/api/audit/", "/api/audit/?action=auth.login&before=15000", None, ["users", "audit_events"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        SELECT audit_events
+          SEARCH audit_events USING INDEX ix_audit_events_action_id (action=? AND id<?)
+    """),
+    ("audit events by actor", "GET", "/api/audit/", "/api/audit/?actor=user7", None, ["users", "audit_events"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+        SELECT audit_events
+          SEARCH audit_events USING INDEX ix_audit_events_actor_id (actor=?)
+    """),
+    ("audit stats", "GET", "/api/audit/stats", "/api/audit/stats", None, ["users"], """
+        SELECT users
+          SEARCH users USING INDEX ix_users_username (username=?)
+    """),
+]
+
+# Distinct statements issued by app.related.refresh_related
+RELATED_REFRESH_PLAN = """
+    SELECT related_products
+      MULTI-INDEX OR
+        INDEX 1
+          SEARCH related_products USING INDEX sqlite_autoindex_related_products_1 (product_id=?)
+        INDEX 2
+          SEARCH related_products USING INDEX ix_related_products_related_id (related_id=?)
+    SELECT products
+      SEARCH products USING INTEGER PRIMARY KEY (rowid=?)
+    SELECT products
+      SEARCH products USING INDEX ix_products_category_price (category=? AND price>?)
+    SELECT products
+      SEARCH products USING INDEX ix_products_category_price (category=? AND price<?)
+    DELETE related_products
+      SEARCH related_products USING INDEX sqlite_autoindex_related_products_1 (product_id=? AND rank>?)
+    SELECT related_products
+      SEARCH related_products USING INDEX sqlite_autoindex_related_products_1 (product_id=?)
+    INSERT related_products
+"""
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+\"?(\w+)", re.IGNORECASE)
+
+def _dedent(text):
+    return textwrap.dedent(text).strip("\n")
+
+def _normalize_sqlite(detail):
+    # SQLite < 3.36 says "SCAN TABLE x" / "SEARCH TABLE x"
+    return re.sub(r"^(SCAN|SEARCH) TABLE ", r"\1 ", detail)
+
+class PlanRecorder:
+    """Records statements emitted through an engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.active = False
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and not executemany:
+            self.statements.append((statement, parameters))
+
+    def explain(self):
+        """Return (header, plan lines) for every recorded statement."""
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            results = []
+            for statement, parameters in self.statements:
+                verb = statement.split(None, 1)[0].upper()
+                match = _TABLE_RE.search(statement)
+                header = f"{verb} {match.group(1) if match else ''}".strip()
+                if self.engine.dialect.name == "sqlite":
+                    cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+                    depth = {0: -1}
+                    lines = []
+                    for node_id, parent, _, detail in cursor.fetchall():
+                        depth[node_id] = depth.get(parent, -1) + 1
+                        lines.append("  " * depth[node_id] + _normalize_sqlite(detail))
+                else:
+                    cursor.execute("EXPLAIN " + statement, parameters)
+                    lines = [row[0] for row in cursor.fetchall()]
+                results.append((header, lines))
+            return results
+        finally:
+            raw.close()
+
+def _seed(engine):
+    Base.metadata.create_all(bind=engine)
+    hashed = get_password_hash(PASSWORD)
+    users = [
+        {"email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": hashed,
+         "is_active": True, "is_admin": i == 0}
+        for i in range(USER_COUNT)
+    ]
+    products = [
+        {"name": f"Product {i}", "description": "Seeded for plan tests", "price": 5 + i % 100,
+         "stock": i % 50, "category": f"category-{i % CATEGORY_COUNT}", "change_seq": i + 1}
+        for i in range(PRODUCT_COUNT)
+    ]
+    actions = ["auth.login", "product.create", "product.patch", "product.delete"]
+    audit_events = [
+        {"occurred_at": datetime(2026, 1, 1) + timedelta(seconds=i), "action": actions[i % len(actions)],
+         "actor": f"user{i % 50}", "target": f"product:{i % PRODUCT_COUNT}", "success": i % 7 != 0}
+        for i in range(AUDIT_EVENT_COUNT)
+    ]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        conn.execute(Product.__table__.insert(), products)
+        conn.execute(ChangeSequence.__table__.insert(), {"name": "products", "value": PRODUCT_COUNT})
+        conn.execute(AuditEvent.__table__.insert(), audit_events)
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("ANALYZE")
+    # Related products stored for product 42 only
+    with Session(bind=engine) as db:
+        refresh_related(db, 42)
+
+def _engines():
+    params = ["sqlite"]
+    if os.getenv("PLAN_TEST_POSTGRES_URL"):
+        params.append("postgresql")
+    return params
+
+@pytest.fixture(scope="module", params=_engines())
+def recorder(request, tmp_path_factory, database_override):
+    if request.param == "sqlite":
+        path = tmp_path_factory.mktemp("plans") / "plans.db"
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(os.environ["PLAN_TEST_POSTGRES_URL"])
+        Base.metadata.drop_all(bind=engine)
+    _seed(engine)
+    with database_override(engine):
+        yield PlanRecorder(engine)
+    if request.param == "postgresql":
+        Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+_unique = itertools.count()
+
+def _request_kwargs(body):
+    """Build the headers/body for a route; every call gets fresh identities."""
+    n = next(_unique)
+    headers = {"Authorization": "Bearer " + create_access_token(data={"sub": "user0"})}
+    if body == "product":
+        return {"headers": headers, "json": {"name": f"Plan {n}", "price": 10, "stock": 1}}
+    if body == "patch":
+        return {"headers": headers, "json": {"stock": n}}
+    if body == "register":
+        return {"json": {"email": f"new{n}@example.com", "username": f"new{n}", "password": PASSWORD}}
+    if body == "login":
+        return {"data": {"username": "user1", "password": PASSWORD}}
+    if body == "login_email":
+        return {"data": {"username": "user1@example.com", "password": PASSWORD}}
+    if body == "refresh":
+        return {"headers": headers, "json": {"refresh_token": create_refresh_token(data={"sub": "user0"})}}
+    return {"headers": headers}
+
+def _report(plans):
+    lines = []
+    for header, plan in plans:
+        lines.append(header)
+        lines.extend("  " + line for line in plan)
+    return "\n".join(lines)
+
+def _check_plans(recorder, plans, label, no_scan, expected):
+    if recorder.engine.dialect.name == "sqlite":
+        actual = _report(plans)
+        expected = _dedent(expected)
+        diff = "\n".join(difflib.unified_diff(
+            expected.splitlines(), actual.splitlines(), "expected", "actual", lineterm=""
+        ))
+        assert actual == expected, f"Query plan changed for {label}:\n{diff}"
+        scan = re.compile(r"^\s*SCAN (%s)\b" % "|".join(no_scan)) if no_scan else None
+    else:
+        assert len(plans) == len([line for line in _dedent(expected).splitlines()
+                                  if line and not line.startswith(" ")])
+        scan = re.compile(r"Seq Scan on (%s)\b" % "|".join(no_scan)) if no_scan else None
+
+    if scan:
+        for header, plan in plans:
+            for line in plan:
+                assert not scan.search(line), f"{header} scans a large table:\n" + "\n".join(plan)
+
+@pytest.mark.parametrize(
+    "name,method,path,url,body,no_scan,expected", ROUTES, ids=[route[0] for route in ROUTES]
+)
+def test_route_query_plans(recorder, monkeypatch, name, method, path, url, body, no_scan, expected):
+    # Related product refreshes run after the response; they are checked separately
+    monkeypatch.setattr(products_routes, "refresh_related_products", lambda *args: None)
+    client = TestClient(app)
+    kwargs = _request_kwargs(body)
+    recorder.statements = []
+    recorder.active = True
+    try:
+        response = client.request(method, url, **kwargs)
+    finally:
+        recorder.active = False
+    assert response.status_code < 400, response.text
+
+    _check_plans(recorder, recorder.explain(), f"{method} {url}", no_scan, expected)
+
+def test_related_refresh_query_plans(recorder):
+    """Each distinct statement refresh_related issues, for a live and a deleted product."""
+    db = Session(bind=recorder.engine)
+    recorder.statements = []
+    recorder.active = True
+    try:
+        refresh_related(db, 100)
+        recorder.active = False
+        db.execute(update(Product).where(Product.id == 100).values(deleted_at=func.now()))
+        db.commit()
+        recorder.active = True
+        refresh_related(db, 100)
+    finally:
+        recorder.active = False
+        db.close()
+
+    plans = []
+    for plan in recorder.explain():
+        if plan not in plans:
+            plans.append(plan)
+    _check_plans(recorder, plans, "refresh_related", ["products", "related_products"], RELATED_REFRESH_PLAN)
+
+def test_every_route_has_a_plan():
+    covered = {(route[1], route[2]) for route in ROUTES}
+    missing = [
+        f"{method} {route.path}"
+        for route in app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+        if (method, route.path) not in covered
+    ]
+    assert not missing, "Routes without a query plan expectation: " + ", ".join(missing)
@@ -0,0 +1,114 @@
+"""
+Related products: the full rebuild and the incremental refresh after a
+product is created or deleted.
+
+    pytest test_related.py
+"""
+import logging
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Product, RelatedProduct
+from app.related import RELATED_K, rebuild_related, refresh_related, refresh_related_products
+
+products_table = Product.__table__
+related_table = RelatedProduct.__table__
+
+# Two categories with their own vocabulary, 12 products each
+CATALOG = [
+    {"name": f"Alpha case {i}", "description": "clear shockproof phone case", "price": 10 + i, "stock": 1,
+     "category": "Phone Cases"}
+    for i in range(12)
+] + [
+    {"name": f"Bravo sleeve {i}", "description": "padded laptop sleeve", "price": 40 + 3 * i, "stock": 1,
+     "category": "Laptop Sleeves"}
+    for i in range(12)
+]
+
+@pytest.fixture
+def db(engine):
+    with Session(bind=engine) as db:
+        db.execute(insert(products_table), CATALOG)
+        db.commit()
+        rebuild_related(db)
+        yield db
+
+def lists(db) -> dict:
+    """{product_id: [related ids, best first]}"""
+    result = {}
+    for row in db.execute(select(related_table).order_by(related_table.c.product_id, related_table.c.rank)):
+        result.setdefault(row.product_id, []).append(row.related_id)
+    return result
+
+def live_ids(db, category: str = None) -> set:
+    query = select(products_table.c.id).where(products_table.c.deleted_at.is_(None))
+    if category:
+        query = query.where(products_table.c.category == category)
+    return set(db.execute(query).scalars())
+
+def soft_delete(db, product_id: int):
+    db.execute(update(products_table).where(products_table.c.id == product_id).values(deleted_at=func.now()))
+    db.commit()
+
+def test_rebuild_lists_are_bounded_and_exclude_self_and_tombstones(db):
+    deleted = live_ids(db, "Phone Cases").pop()
+    soft_delete(db, deleted)
+    rebuild_related(db)
+
+    related = lists(db)
+    assert set(related) == live_ids(db)
+    for product_id, ids in related.items():
+        assert 0 < len(ids) <= RELATED_K
+        assert product_id not in ids
+        assert deleted not in ids
+        assert len(set(ids)) == len(ids)
+
+def test_refresh_after_create_matches_a_rebuild(db):
+    neighbours = live_ids(db, "Phone Cases")
+    new_id = db.execute(
+        insert(products_table).values(name="Alpha case 12", description="clear shockproof phone case",
+                                      price=15.5, stock=1, category="Phone Cases")
+        .returning(products_table.c.id)
+    ).scalar_one()
+    db.commit()
+
+    refresh_related(db, new_id)
+    incremental = lists(db)
+
+    assert len(incremental[new_id]) == RELATED_K
+    # The nearest same-category products now list it; the other category doesn't
+    for product_id in neighbours:
+        if abs(db.get(Product, product_id).price - 15.5) < 2:
+            assert new_id in incremental[product_id]
+    assert all(new_id not in incremental[product_id] for product_id in live_ids(db, "Laptop Sleeves"))
+
+    rebuild_related(db)
+    assert incremental == lists(db)
+
+def test_refresh_after_delete_drops_and_refills(db):
+    before = lists(db)
+    deleted = next(iter(live_ids(db, "Phone Cases")))
+    referrers = [product_id for product_id, ids in before.items() if deleted in ids]
+    assert referrers
+
+    soft_delete(db, deleted)
+    refresh_related(db, deleted)
+    incremental = lists(db)
+
+    assert deleted not in incremental
+    for product_id in referrers:
+        assert deleted not in incremental[product_id]
+        # Eleven live phone cases are left, so every list is refilled to K
+        assert len(incremental[product_id]) == RELATED_K
+
+    rebuild_related(db)
+    assert incremental == lists(db)
+
+def test_background_refresh_logs_failures(tmp_path, caplog):
+    # No tables: the refresh fails, and the background task must not raise
+    engine = create_engine(f"sqlite:///{tmp_path}/empty.db")
+    with caplog.at_level(logging.ERROR, logger="app.related"):
+        refresh_related_products(engine, 1)
+    assert "Refreshing related products for product 1 failed" in caplog.text
@@ -45,13 +45,18 @@ export const getProduct = async (id: number) => {
   return response.data;
 };
 
+export const getRelatedProducts = async (id: number) => {
+  const response = await api.get<Product[]>(`/products/${id}/related`);
+  return response.data;
+};
+
 export const createProduct = async (productData: ProductCreateData) => {
   const response = await api.post<Product>('/products/', productData);
   return response.data;
 };
 
 export const updateProduct = async (id: number, productData: ProductUpdateData) => {
-  const response = await api.put<Product>(`/products/${id}`, productData);
+  const response = await api.patch<Product>(`/products/${id}`, productData);
   return response.data;
 };
 